@@ -0,0 +1,313 @@
+"""Offline bulk scoring: stream JSONL/CSV messages through a process pool.
+
+    python -m app.bulk_score messages.jsonl --out scored.jsonl
+    python -m app.bulk_score dump.csv --column text --pg --iocs-out iocs.jsonl
+    cat messages.jsonl | python -m app.bulk_score - --format jsonl --out -
+
+Input is read lazily and cut into chunks. Each chunk is scored in a worker
+process with analyze_batch + extract_intel. At most ``2 * workers`` chunks are
+in flight, so memory stays flat however large the input is. Results come back
+in input order. Only app.scoring and app.extractor are loaded, never the API
+app, so message memory, sessions and IOC counters are not touched.
+
+Outputs:
+- ``--out``: one JSON line per message with its score, type, reasons and IOCs.
+- ``--pg``: scam rows bulk-inserted through pg_db, one transaction per chunk.
+- ``--iocs-out``: every distinct IOC with its message count, sorted by type and
+  value. Counts beyond BULK_IOC_SPILL distinct IOCs are spilled to sorted temp
+  files and merged at the end, so this stays bounded too.
+
+Throughput (rows/sec) goes to stderr while running and in the final summary.
+"""
+from __future__ import annotations
+import argparse
+import csv
+import heapq
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, TextIO, Tuple
+
+from app.extractor import extract_intel
+from app.fastjson import dumps
+from app.scoring import analyze_batch
+
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "2000"))
+BULK_IOC_SPILL = int(os.getenv("BULK_IOC_SPILL", "500000"))  # distinct IOCs held in memory
+
+_INTEL_KINDS = ("upi_ids", "phone_numbers", "links", "domains")
+
+
+# -----------------------------
+# Input
+# -----------------------------
+def _open(path: str) -> TextIO:
+    if path == "-":
+        return sys.stdin
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _detect_format(path: str) -> str:
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def iter_messages(path: str, fmt: str, column: str) -> Iterator[Optional[str]]:
+    """Messages from one file, one at a time; None for a row without a usable message."""
+    f = _open(path)
+    try:
+        if fmt == "csv":
+            # scam dumps regularly carry whole e-mails in a single cell
+            csv.field_size_limit(sys.maxsize)
+            for row in csv.DictReader(f):
+                value = row.get(column)
+                yield value if value else None
+            return
+
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                yield None
+                continue
+            if isinstance(item, dict):
+                item = item.get(column)
+            yield item if isinstance(item, str) else None
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def _chunks(messages: Iterator[Optional[str]], size: int) -> Iterator[Tuple[int, List[Optional[str]]]]:
+    chunk: List[Optional[str]] = []
+    start = 0
+    for m in messages:
+        chunk.append(m)
+        if len(chunk) >= size:
+            yield start, chunk
+            start += len(chunk)
+            chunk = []
+    if chunk:
+        yield start, chunk
+
+
+# -----------------------------
+# Worker
+# -----------------------------
+def score_chunk(start: int, texts: List[Optional[str]], source: str, want_lines: bool,
+                want_rows: bool, want_iocs: bool) -> Dict[str, Any]:
+    """Score one chunk; returns encoded output lines, pg rows and IOC counts for it."""
+    valid = [t for t in texts if t is not None]
+    scored = iter(analyze_batch(valid))
+
+    lines: List[str] = []
+    rows: List[dict] = []
+    iocs: Counter = Counter()
+    scams = 0
+    for i, t in enumerate(texts):
+        if t is None:
+            if want_lines:
+                lines.append(dumps({"index": start + i, "error": "invalid_item"}))
+            continue
+
+        result = next(scored)
+        intel = extract_intel(t)
+        if result["is_scam"]:
+            scams += 1
+            if want_rows:
+                rows.append({"m": t, "t": result["scam_type"], "c": result["scam_score"], "s": source})
+        if want_iocs:
+            for kind in _INTEL_KINDS:
+                for value in intel[kind]:
+                    iocs[(kind, value)] += 1
+        if want_lines:
+            lines.append(dumps({
+                "index": start + i,
+                "is_scam": result["is_scam"],
+                "scam_score": result["scam_score"],
+                "scam_type": result["scam_type"],
+                "reasons": result["reasons"],
+                "intel": {kind: sorted(intel[kind]) for kind in _INTEL_KINDS},
+            }))
+
+    return {
+        "rows": len(texts),
+        "invalid": len(texts) - len(valid),
+        "scams": scams,
+        "lines": "\n".join(lines) + "\n" if lines else "",
+        "pg_rows": rows,
+        "iocs": iocs,
+    }
+
+
+# -----------------------------
+# IOC counts
+# -----------------------------
+class IocCounts:
+    """(type, value) -> count with bounded memory: full counters are written out
+    as sorted runs and merged when read back."""
+
+    def __init__(self, spill_at: int = BULK_IOC_SPILL):
+        self.spill_at = max(1, spill_at)
+        self._counts: Counter = Counter()
+        self._runs: List[TextIO] = []
+
+    def update(self, counts: Counter) -> None:
+        self._counts.update(counts)
+        if len(self._counts) >= self.spill_at:
+            self._spill()
+
+    def _spill(self) -> None:
+        f = tempfile.TemporaryFile("w+", encoding="utf-8")
+        for (kind, value), n in sorted(self._counts.items()):
+            f.write(json.dumps([kind, value, n]) + "\n")
+        f.seek(0)
+        self._runs.append(f)
+        self._counts = Counter()
+
+    @staticmethod
+    def _read_run(f: TextIO) -> Iterator[Tuple[str, str, int]]:
+        for line in f:
+            kind, value, n = json.loads(line)
+            yield kind, value, n
+
+    def items(self) -> Iterator[Tuple[str, str, int]]:
+        """(type, value, count) for every distinct IOC, in (type, value) order."""
+        in_memory = ((kind, value, n) for (kind, value), n in sorted(self._counts.items()))
+        current = None
+        for kind, value, n in heapq.merge(in_memory, *(self._read_run(f) for f in self._runs)):
+            if current is not None and current[0] == kind and current[1] == value:
+                current[2] += n
+                continue
+            if current is not None:
+                yield tuple(current)
+            current = [kind, value, n]
+        if current is not None:
+            yield tuple(current)
+
+    def close(self) -> None:
+        for f in self._runs:
+            f.close()
+        self._runs = []
+
+
+# -----------------------------
+# Driver
+# -----------------------------
+class _Progress:
+    def __init__(self, every: float):
+        self.every = every
+        self.start = time.perf_counter()
+        self._last = self.start
+        self.rows = self.invalid = self.scams = 0
+
+    def add(self, part: Dict[str, Any]) -> None:
+        self.rows += part["rows"]
+        self.invalid += part["invalid"]
+        self.scams += part["scams"]
+        now = time.perf_counter()
+        if self.every > 0 and now - self._last >= self.every:
+            self._last = now
+            print(f"rows={self.rows} rows/sec={self.rate():.0f}", file=sys.stderr)
+
+    def rate(self) -> float:
+        elapsed = time.perf_counter() - self.start
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "invalid": self.invalid,
+            "scams": self.scams,
+            "seconds": round(time.perf_counter() - self.start, 3),
+            "rows_per_sec": round(self.rate(), 1),
+        }
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    insert_rows = None
+    if args.pg:
+        # imported only when asked: pg_db connects to DATABASE_URL at import time
+        from app.pg_db import insert_scam_messages as insert_rows
+
+    out = None
+    if args.out:
+        out = sys.stdout if args.out == "-" else open(args.out, "w", encoding="utf-8")
+    iocs = IocCounts(BULK_IOC_SPILL)
+    progress = _Progress(args.progress)
+
+    def consume(part: Dict[str, Any]) -> None:
+        if out is not None and part["lines"]:
+            out.write(part["lines"])
+        if insert_rows is not None and part["pg_rows"]:
+            insert_rows(part["pg_rows"])
+        iocs.update(part["iocs"])
+        progress.add(part)
+
+    def messages() -> Iterator[Optional[str]]:
+        for path in args.inputs:
+            yield from iter_messages(path, args.format or _detect_format(path), args.column)
+
+    flags = (args.source, out is not None, insert_rows is not None, bool(args.iocs_out))
+    chunks = _chunks(messages(), args.chunk_size)
+    try:
+        if args.workers <= 1:
+            for start, texts in chunks:
+                consume(score_chunk(start, texts, *flags))
+        else:
+            max_in_flight = 2 * args.workers
+            with ProcessPoolExecutor(max_workers=args.workers) as pool:
+                pending: deque[Future] = deque()
+                for start, texts in chunks:
+                    pending.append(pool.submit(score_chunk, start, texts, *flags))
+                    if len(pending) >= max_in_flight:
+                        consume(pending.popleft().result())
+                while pending:
+                    consume(pending.popleft().result())
+    finally:
+        if out is not None and out is not sys.stdout:
+            out.close()
+
+    distinct = 0
+    if args.iocs_out:
+        with open(args.iocs_out, "w", encoding="utf-8") as f:
+            for kind, value, count in iocs.items():
+                f.write(dumps({"type": kind, "value": value, "count": count}) + "\n")
+                distinct += 1
+    iocs.close()
+
+    summary = progress.summary()
+    summary["workers"] = args.workers
+    summary["distinct_iocs"] = distinct
+    return summary
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="JSONL or CSV files ('-' for stdin)")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="default: from the file extension")
+    parser.add_argument("--column", default="message", help="JSONL key / CSV column holding the text")
+    parser.add_argument("--out", help="write one scored JSON line per message here ('-' for stdout)")
+    parser.add_argument("--pg", action="store_true", help="bulk-insert scam rows into Postgres (DATABASE_URL)")
+    parser.add_argument("--source", default="bulk", help="source column for --pg rows")
+    parser.add_argument("--iocs-out", help="write distinct IOCs with message counts here (JSONL)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=BULK_CHUNK_SIZE)
+    parser.add_argument("--progress", type=float, default=5.0, help="seconds between progress lines (0: off)")
+    args = parser.parse_args(argv)
+
+    if not (args.out or args.pg or args.iocs_out):
+        parser.error("nothing to write: pass --out, --pg and/or --iocs-out")
+
+    summary = run(args)
+    print(json.dumps(summary), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
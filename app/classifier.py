@@ -1,16 +1,24 @@
-def classify_scam_type(text: str) -> str:
-    t = text.lower()
+from app.keywords import (
+    find_keywords, has_any,
+    BANK_KYC_KEYWORDS, COURIER_KEYWORDS, JOB_SCAM_KEYWORDS,
+    LOTTERY_KEYWORDS, TECH_SUPPORT_KEYWORDS, UPI_KEYWORDS,
+)
 
-    if "kyc" in t or "bank" in t or "account" in t or "blocked" in t:
+
+def classify_scam_type(text: str, hits=None) -> str:
+    if hits is None:
+        hits = find_keywords(text)
+
+    if has_any(hits, BANK_KYC_KEYWORDS):
         return "BANK_KYC"
-    if "courier" in t or "parcel" in t or "delivery" in t:
+    if has_any(hits, COURIER_KEYWORDS):
         return "COURIER"
-    if "job" in t or "hr" in t or "salary" in t or "interview" in t:
+    if has_any(hits, JOB_SCAM_KEYWORDS):
         return "JOB_SCAM"
-    if "lottery" in t or "winner" in t or "prize" in t:
+    if has_any(hits, LOTTERY_KEYWORDS):
         return "LOTTERY"
-    if "anydesk" in t or "teamviewer" in t or "remote access" in t:
+    if has_any(hits, TECH_SUPPORT_KEYWORDS):
         return "TECH_SUPPORT"
-    if "upi" in t or "pay" in t:
+    if has_any(hits, UPI_KEYWORDS):
         return "UPI_PAYMENT"
     return "UNKNOWN"
@@ -1,35 +1,31 @@
 import re
 
-HARD_KEYWORDS = [
-    "bank", "blocked", "kyc", "upi", "otp",
-    "immediately", "pay", "account", "verify"
-]
+from app.keywords import find_keywords, HARD_KEYWORDS, SOFT_KEYWORDS
 
-SOFT_KEYWORDS = [
-    "credit card", "reward", "reward points",
-    "expiring", "redeem", "confirm details"
-]
+# Yes/no checks only: compiled once, and search() stops at the first match.
+# Deliberately looser than app/extractor.py (any 10 digits, case-sensitive
+# scheme, no word boundaries), which is what this score was tuned on.
+UPI_RE = re.compile(r"[a-zA-Z0-9.\-_]{2,}@[a-zA-Z]{2,}")
+URL_RE = re.compile(r"https?://\S+")
+PHONE_RE = re.compile(r"\b\d{10}\b")
 
-UPI_REGEX = r"[a-zA-Z0-9.\-_]{2,}@[a-zA-Z]{2,}"
-URL_REGEX = r"https?://\S+"
-PHONE_REGEX = r"\b\d{10}\b"
-
-def detect_scam(text: str):
-    text_l = text.lower()
+def detect_scam(text: str, hits=None):
+    if hits is None:
+        hits = find_keywords(text)
 
     reasons = []
     score = 0.0
 
     # Hard keywords
     for k in HARD_KEYWORDS:
-        if k in text_l:
+        if k in hits:
             reasons.append(f"keyword:{k}")
             score += 0.2
 
     # Soft keywords (credit card reward type)
     soft_count = 0
     for k in SOFT_KEYWORDS:
-        if k in text_l:
+        if k in hits:
             soft_count += 1
 
     if soft_count >= 2:
@@ -37,15 +33,15 @@ def detect_scam(text: str):
         score += 0.4
 
     # UPI / link / phone
-    if re.search(UPI_REGEX, text):
+    if UPI_RE.search(text):
         reasons.append("has_upi")
         score += 0.4
 
-    if re.search(URL_REGEX, text):
+    if URL_RE.search(text):
         reasons.append("has_link")
         score += 0.4
 
-    if re.search(PHONE_REGEX, text):
+    if PHONE_RE.search(text):
         reasons.append("has_phone")
         score += 0.3
 
@@ -1,24 +1,38 @@
 from __future__ import annotations
 import re
+from functools import lru_cache
 from urllib.parse import urlparse
 
 _UPI_RE = re.compile(r"\b[a-z0-9.\-_]{2,}@[a-z]{2,}\b", re.IGNORECASE)
 _PHONE_RE = re.compile(r"\b(?:\+91[\-\s]?)?[6-9]\d{9}\b")
 _LINK_RE = re.compile(r"\bhttps?://[^\s<>]+", re.IGNORECASE)
 
+LINK_DOMAIN_CACHE_SIZE = 8192
+
+
+@lru_cache(maxsize=LINK_DOMAIN_CACHE_SIZE)
+def _link_domain(link: str) -> str | None:
+    try:
+        return urlparse(link).netloc.lower()
+    except Exception:
+        return None
+
+
 def extract_intel(text: str) -> dict:
     text = text or ""
 
-    upi_ids = set(m.group(0).lower() for m in _UPI_RE.finditer(text))
+    # ✅ each pattern scans the whole text on its own (glued tokens such as
+    # "support@https://..." must yield both the UPI and the link); the UPI and
+    # link scans are skipped when their required literal is absent
+    upi_ids = set(m.group(0).lower() for m in _UPI_RE.finditer(text)) if "@" in text else set()
     phone_numbers = set(m.group(0) for m in _PHONE_RE.finditer(text))
-    links = set(m.group(0) for m in _LINK_RE.finditer(text))
+    links = set(m.group(0) for m in _LINK_RE.finditer(text)) if "://" in text else set()
 
     domains = set()
     for link in links:
-        try:
-            domains.add(urlparse(link).netloc.lower())
-        except Exception:
-            pass
+        domain = _link_domain(link)
+        if domain is not None:
+            domains.add(domain)
 
     return {
         "upi_ids": upi_ids,
@@ -0,0 +1,78 @@
+from __future__ import annotations
+from typing import Any, Type
+import json
+import os
+
+from fastapi import Body, Depends, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, ValidationError
+
+try:
+    import orjson
+except ImportError:  # FAST_JSON then has no effect
+    orjson = None
+
+# -----------------------------
+# Opt-in fast JSON path (FAST_JSON=1, needs orjson)
+# -----------------------------
+# Responses: handlers hand back a FastJSONResponse, which FastAPI sends as is,
+# skipping jsonable_encoder (the bulk of the cost for large session payloads).
+# Requests: bodies are parsed and validated in one pass by pydantic-core
+# (model_validate_json) instead of json.loads + dict validation.
+FAST_JSON = os.getenv("FAST_JSON", "0") == "1" and orjson is not None
+
+_ORJSON_OPTIONS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    return jsonable_encoder(obj)
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=_ORJSON_OPTIONS)
+
+
+def respond(content: Any) -> Any:
+    """Return value for a handler: pre-encoded response in fast mode, the plain dict otherwise."""
+    if FAST_JSON:
+        return FastJSONResponse(content)
+    return content
+
+
+def dumps(obj: Any) -> str:
+    if FAST_JSON:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS).decode()
+    return json.dumps(obj)
+
+
+def json_body(model: Type[BaseModel]):
+    """Parameter default for a request model: a normal body param, or single-pass parsing in fast mode."""
+    if not FAST_JSON:
+        return Body()
+
+    async def parse(request: Request) -> BaseModel:
+        try:
+            return model.model_validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError(
+                [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)]
+            )
+
+    return Depends(parse)
+
+
+def body_schema(model: Type[BaseModel]) -> dict | None:
+    """openapi_extra documenting the body that json_body() reads in fast mode."""
+    if not FAST_JSON:
+        return None
+    return {
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": model.model_json_schema()}},
+        }
+    }
@@ -1,54 +1,67 @@
 from __future__ import annotations
 
+import asyncio
+import os
+import time
+import weakref
+
+from starlette.concurrency import run_in_threadpool
+
 from app.extractor import extract_intel
+from app.keywords import (
+    find_keywords, has_any,
+    COLLECT_INTENT_KEYWORDS, PAYMENT_INTENT_KEYWORDS, LINK_INTENT_KEYWORDS,
+    OTP_INTENT_KEYWORDS, REFUSAL_PHRASES, SITE_REFUSAL_PHRASES,
+)
+from app.llm_agent import generate_honeypot_reply_async
+from app.metrics import stage
 from app.sessions import (
-    get_session, end_session, add_message, update_last_scammer_time,
-    memory_update
+    Session, get_session, save_session, session_lock, session_transaction,
+    memory_update, message_hash, index_session_intel,
 )
 
 MAX_TURNS = 8
 REPEAT_LIMIT = 3
 NO_PROGRESS_LIMIT = 3
 
+# HONEYPOT_LLM_REPLIES=1: let the model write replies (needs OPENAI_API_KEY)
+HONEYPOT_LLM_REPLIES = os.getenv("HONEYPOT_LLM_REPLIES", "0") == "1"
+HONEYPOT_PERSONA = os.getenv("HONEYPOT_PERSONA", "confused_customer")
+
 
-def _intent_key(text: str) -> str:
-    t = (text or "").lower()
-    if "collect request" in t or "collect" in t or "request money" in t:
+def _intent_key(text: str, hits=None) -> str:
+    if hits is None:
+        hits = find_keywords(text)
+    if has_any(hits, COLLECT_INTENT_KEYWORDS):
         return "COLLECT"
-    if "upi" in t or "pay" in t or "pin" in t:
+    if has_any(hits, PAYMENT_INTENT_KEYWORDS):
         return "PAYMENT"
-    if "http" in t or "link" in t or "www" in t:
+    if has_any(hits, LINK_INTENT_KEYWORDS):
         return "LINK"
-    if "otp" in t:
+    if has_any(hits, OTP_INTENT_KEYWORDS):
         return "OTP"
     return "OTHER"
 
 
-def _update_repeat_state(session: dict, scammer_text: str) -> None:
-    intent = _intent_key(scammer_text)
-    if intent == session.get("last_intent", ""):
-        session["repeat_count"] = session.get("repeat_count", 0) + 1
+def _update_repeat_state(session: Session, scammer_text: str, hits=None) -> None:
+    intent = _intent_key(scammer_text, hits)
+    if intent == session.last_intent:
+        session.repeat_count += 1
     else:
-        session["last_intent"] = intent
-        session["repeat_count"] = 0
-
-
-def _is_refusal(text: str) -> bool:
-    t = (text or "").lower().strip()
-    refusal_phrases = [
-        "i won't send", "i wont send", "won't send",
-        "can't share", "cant share", "not possible",
-        "no website", "no link", "not needed",
-        "just pay", "stop asking"
-    ]
-    return any(p in t for p in refusal_phrases)
-
-
-def _all_intel_collected(session: dict) -> bool:
-    intel = session["intel"]
-    has_upi = len(intel["upi_ids"]) > 0
-    has_phone = len(intel["phone_numbers"]) > 0
-    has_link_or_domain = (len(intel["links"]) > 0) or (len(intel["domains"]) > 0)
+        session.last_intent = intent
+        session.repeat_count = 0
+
+
+def _is_refusal(text: str, hits=None) -> bool:
+    if hits is None:
+        hits = find_keywords(text)
+    return has_any(hits, REFUSAL_PHRASES)
+
+
+def _all_intel_collected(session: Session) -> bool:
+    has_upi = len(session.upi_ids) > 0
+    has_phone = len(session.phone_numbers) > 0
+    has_link_or_domain = (len(session.links) > 0) or (len(session.domains) > 0)
     return has_upi and has_phone and has_link_or_domain
 
 
@@ -64,20 +77,21 @@ def _final_exit_message(reason: str) -> str:
     return "I can’t continue this conversation."
 
 
-def _adaptive_reply(session: dict, scammer_text: str) -> str:
-    intel = session["intel"]
-    t = (scammer_text or "").lower()
+def _adaptive_reply(session: Session, scammer_text: str, hits=None) -> str:
+    if hits is None:
+        hits = find_keywords(scammer_text)
+    refusal = _is_refusal(scammer_text, hits)
 
-    if _is_refusal(scammer_text) and ("no website" in t or "no link" in t or "not needed" in t):
-        session["refused_site_flag"] = True
+    if refusal and has_any(hits, SITE_REFUSAL_PHRASES):
+        session.refused_site_flag = True
 
-    refused_site_flag = session.get("refused_site_flag", False)
+    refused_site_flag = session.refused_site_flag
 
-    need_link = (len(intel["links"]) == 0 and len(intel["domains"]) == 0)
-    need_upi = (len(intel["upi_ids"]) == 0)
-    need_phone = (len(intel["phone_numbers"]) == 0)
+    need_link = (len(session.links) == 0 and len(session.domains) == 0)
+    need_upi = (len(session.upi_ids) == 0)
+    need_phone = (len(session.phone_numbers) == 0)
 
-    if _is_refusal(scammer_text):
+    if refusal:
         if need_phone:
             return "Okay. Then share a phone number/helpline so I can confirm before paying."
         if need_upi:
@@ -98,75 +112,183 @@ def _adaptive_reply(session: dict, scammer_text: str) -> str:
     return "Before paying, confirm: is this a collect request or a normal payment? Explain steps."
 
 
+def _stop_reason(session: Session) -> str | None:
+    if _all_intel_collected(session):
+        return "all_intel_collected"
+    if session.no_progress_count >= NO_PROGRESS_LIMIT:
+        return "no_intel_progress"
+    if session.turns >= MAX_TURNS:
+        return "max_turns"
+    if session.repeat_count >= REPEAT_LIMIT:
+        return "repeated_intent"
+    return None
+
+
+def _goal_hint(session: Session) -> str:
+    missing = []
+    if len(session.links) == 0 and len(session.domains) == 0:
+        missing.append("the official website or payment link")
+    if len(session.upi_ids) == 0:
+        missing.append("the exact UPI ID and merchant name")
+    if len(session.phone_numbers) == 0:
+        missing.append("a support phone number")
+    if not missing:
+        return "Ask them to explain the exact payment steps."
+    return "Get them to share " + ", ".join(missing) + "."
+
+
+def _reply_cache_key(session: Session, scammer_text: str) -> str:
+    """Conversation state the reply depends on (what is still missing, intent, persona)
+    plus the normalized scammer message."""
+    need_link = len(session.links) == 0 and len(session.domains) == 0
+    need_upi = len(session.upi_ids) == 0
+    need_phone = len(session.phone_numbers) == 0
+    flags = "".join("1" if f else "0" for f in (need_link, need_upi, need_phone))
+    return f"{HONEYPOT_PERSONA}|{session.last_intent}|{flags}|{message_hash(scammer_text)}"
+
+
+def _llm_history(session: Session) -> list[dict]:
+    return [{"role": role, "content": text} for role, text, _ in session.messages]
+
+
+def _advance_turn(s: Session, scammer_text: str, hits) -> dict | None:
+    """Apply an incoming scammer message; returns the final response if the session stops."""
+    s.last_scammer_time = time.time()
+    s.add_message("scammer", scammer_text)
+
+    with stage("honeypot.extract"):
+        extracted = extract_intel(scammer_text)
+        seen = len(s.intel_log)
+        progress = s.add_intel(extracted)
+        if progress:
+            index_session_intel(s.id, s.intel_log[seen:])
+
+    # ✅ update memory with intel from this scammer message
+    with stage("honeypot.memory_update"):
+        memory_update(scammer_text, intel=extracted)
+
+    if not progress:
+        s.no_progress_count += 1
+    else:
+        s.no_progress_count = 0
+
+    with stage("honeypot.stop_rules"):
+        _update_repeat_state(s, scammer_text, hits)
+        reason = _stop_reason(s)
+    if reason:
+        s.end(reason)
+        final_msg = _final_exit_message(reason)
+        s.add_message("honeypot", final_msg)
+        save_session(s)
+        return {"status": "ENDED", "stop_reason": reason, "reply": final_msg}
+    return None
+
+
 def handle_incoming_scammer_message(session_id: str, scammer_text: str) -> dict:
+    # ✅ turns on one session are serialized; other sessions proceed in parallel
+    lock = session_lock(session_id)
+    if lock is None:
+        return {"error": "session_not_found"}
+    with stage("honeypot.lock_wait"):
+        lock.acquire()
+    try:
+        with session_transaction():
+            return _handle_turn(session_id, scammer_text)
+    finally:
+        lock.release()
+
+
+def _handle_turn(session_id: str, scammer_text: str) -> dict:
     s = get_session(session_id)
     if not s:
         return {"error": "session_not_found"}
-    if s["status"] == "ENDED":
+    if s.status == "ENDED":
         return {"status": "ENDED", "reply": None}
 
     scammer_text = scammer_text or ""
-    update_last_scammer_time(session_id)
-    add_message(session_id, "scammer", scammer_text)
+    hits = find_keywords(scammer_text)
+    done = _advance_turn(s, scammer_text, hits)
+    if done:
+        return done
+
+    with stage("honeypot.reply"):
+        reply = _adaptive_reply(s, scammer_text, hits)
+    s.turns += 1
+    s.add_message("honeypot", reply)
+    with stage("honeypot.save"):
+        save_session(s)
+    return {"status": "RUNNING", "reply": reply}
 
-    before = (
-        len(s["intel"]["upi_ids"]),
-        len(s["intel"]["phone_numbers"]),
-        len(s["intel"]["links"]),
-        len(s["intel"]["domains"]),
-    )
 
-    extracted = extract_intel(scammer_text)
-    for k in extracted:
-        s["intel"][k].update(extracted[k])
+# -----------------------------
+# LLM replies (async)
+# -----------------------------
+# The model call is awaited outside the thread locks; an asyncio lock per
+# session keeps that session's turns in order meanwhile.
+_ASYNC_SESSION_LOCKS: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
 
-    # ✅ update memory with intel from this scammer message
-    memory_update(scammer_text, intel={
-        "upi_ids": list(extracted["upi_ids"]),
-        "phone_numbers": list(extracted["phone_numbers"]),
-        "links": list(extracted["links"]),
-        "domains": list(extracted["domains"]),
-    })
-
-    after = (
-        len(s["intel"]["upi_ids"]),
-        len(s["intel"]["phone_numbers"]),
-        len(s["intel"]["links"]),
-        len(s["intel"]["domains"]),
-    )
-
-    if after == before:
-        s["no_progress_count"] += 1
-    else:
-        s["no_progress_count"] = 0
-
-    _update_repeat_state(s, scammer_text)
-
-    if _all_intel_collected(s):
-        end_session(session_id, "all_intel_collected")
-        final_msg = _final_exit_message("all_intel_collected")
-        add_message(session_id, "honeypot", final_msg)
-        return {"status": "ENDED", "stop_reason": "all_intel_collected", "reply": final_msg}
-
-    if s["no_progress_count"] >= NO_PROGRESS_LIMIT:
-        end_session(session_id, "no_intel_progress")
-        final_msg = _final_exit_message("no_intel_progress")
-        add_message(session_id, "honeypot", final_msg)
-        return {"status": "ENDED", "stop_reason": "no_intel_progress", "reply": final_msg}
-
-    if s["turns"] >= MAX_TURNS:
-        end_session(session_id, "max_turns")
-        final_msg = _final_exit_message("max_turns")
-        add_message(session_id, "honeypot", final_msg)
-        return {"status": "ENDED", "stop_reason": "max_turns", "reply": final_msg}
-
-    if s["repeat_count"] >= REPEAT_LIMIT:
-        end_session(session_id, "repeated_intent")
-        final_msg = _final_exit_message("repeated_intent")
-        add_message(session_id, "honeypot", final_msg)
-        return {"status": "ENDED", "stop_reason": "repeated_intent", "reply": final_msg}
-
-    reply = _adaptive_reply(s, scammer_text)
-    s["turns"] += 1
-    add_message(session_id, "honeypot", reply)
-    return {"status": "RUNNING", "reply": reply}
+
+def _async_session_lock(session_id: str) -> asyncio.Lock:
+    lock = _ASYNC_SESSION_LOCKS.get(session_id)
+    if lock is None:
+        lock = asyncio.Lock()
+        _ASYNC_SESSION_LOCKS[session_id] = lock
+    return lock
+
+
+def _prepare_llm_turn(session_id: str, scammer_text: str) -> dict:
+    lock = session_lock(session_id)
+    if lock is None:
+        return {"error": "session_not_found"}
+    with lock, session_transaction():
+        s = get_session(session_id)
+        if not s:
+            return {"error": "session_not_found"}
+        if s.status == "ENDED":
+            return {"status": "ENDED", "reply": None}
+
+        scammer_text = scammer_text or ""
+        hits = find_keywords(scammer_text)
+        done = _advance_turn(s, scammer_text, hits)
+        if done:
+            return done
+
+        # served instead of the model reply when the LLM is shed, slow or failing
+        fallback = _adaptive_reply(s, scammer_text, hits)
+        save_session(s)
+        return {
+            "pending": True, "history": _llm_history(s),
+            "goal_hint": _goal_hint(s), "fallback": fallback,
+            "cache_key": _reply_cache_key(s, scammer_text),
+        }
+
+
+def _finish_llm_turn(session_id: str, reply: str) -> dict:
+    lock = session_lock(session_id)
+    if lock is None:
+        return {"error": "session_not_found"}
+    with lock, session_transaction():
+        s = get_session(session_id)
+        if not s:
+            return {"error": "session_not_found"}
+        s.turns += 1
+        s.add_message("honeypot", reply)
+        save_session(s)
+        return {"status": "RUNNING", "reply": reply}
+
+
+async def handle_incoming_scammer_message_async(session_id: str, scammer_text: str) -> dict:
+    if not HONEYPOT_LLM_REPLIES:
+        return await run_in_threadpool(handle_incoming_scammer_message, session_id, scammer_text)
+
+    async with _async_session_lock(session_id):
+        prepared = await run_in_threadpool(_prepare_llm_turn, session_id, scammer_text)
+        if not prepared.get("pending"):
+            return prepared
+
+        with stage("honeypot.llm"):
+            reply = await generate_honeypot_reply_async(
+                HONEYPOT_PERSONA, prepared["history"], prepared["goal_hint"],
+                fallback=prepared["fallback"], cache_key=prepared["cache_key"],
+            )
+        return await run_in_threadpool(_finish_llm_turn, session_id, reply)
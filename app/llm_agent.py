@@ -1,5 +1,13 @@
+import asyncio
 import os
-from openai import OpenAI
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
 
 PERSONA_SYSTEM = {
     "confused_customer": (
@@ -13,14 +21,227 @@ FALLBACK_REPLY = (
     "I’m confused. Which bank is this from? Please share the official website and a reference number."
 )
 
-def generate_honeypot_reply(persona: str, history: list[dict], goal_hint: str = "") -> str:
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4o-mini")
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "8.0"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "100"))
+LLM_MAX_KEEPALIVE = int(os.getenv("LLM_MAX_KEEPALIVE", "20"))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv("LLM_KEEPALIVE_EXPIRY", "30"))
+
+# Guard rails so a slow or failing provider never holds up a honeypot turn
+LLM_TURN_BUDGET_SECONDS = float(os.getenv("LLM_TURN_BUDGET_SECONDS", "3.0"))  # whole call, retries included
+LLM_MAX_IN_FLIGHT = int(os.getenv("LLM_MAX_IN_FLIGHT", "32"))  # beyond this, serve the fallback
+LLM_BREAKER_WINDOW = int(os.getenv("LLM_BREAKER_WINDOW", "20"))
+LLM_BREAKER_MIN_CALLS = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+LLM_BREAKER_FAILURE_RATE = float(os.getenv("LLM_BREAKER_FAILURE_RATE", "0.5"))
+LLM_BREAKER_SLOW_SECONDS = float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "2.0"))
+LLM_BREAKER_COOLDOWN_SECONDS = float(os.getenv("LLM_BREAKER_COOLDOWN_SECONDS", "30"))
+
+
+class CircuitBreaker:
+    """Opens when too many recent calls failed or were slow; then sheds calls until a
+    cooldown passes and a single probe call succeeds."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, window: int, min_calls: int, failure_rate: float,
+                 slow_seconds: float, cooldown_seconds: float):
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_seconds = slow_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.state = self.CLOSED
+        self._recent = deque(maxlen=window)  # True = bad (error or slow)
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                self.state = self.HALF_OPEN
+                self._probing = False
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, ok: bool, latency: float) -> None:
+        bad = (not ok) or latency >= self.slow_seconds
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+                if bad:
+                    self._trip()
+                else:
+                    self.state = self.CLOSED
+                    self._recent.clear()
+                return
+
+            self._recent.append(bad)
+            if (
+                len(self._recent) >= self.min_calls
+                and sum(self._recent) / len(self._recent) >= self.failure_rate
+            ):
+                self._trip()
+
+    def _trip(self) -> None:
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._recent.clear()
+
+
+_BREAKER = CircuitBreaker(
+    LLM_BREAKER_WINDOW, LLM_BREAKER_MIN_CALLS, LLM_BREAKER_FAILURE_RATE,
+    LLM_BREAKER_SLOW_SECONDS, LLM_BREAKER_COOLDOWN_SECONDS,
+)
+_SYNC_SLOTS = threading.BoundedSemaphore(LLM_MAX_IN_FLIGHT)
+_async_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+_LLM_STATS = {"calls": 0, "errors": 0, "shed_breaker": 0, "shed_concurrency": 0}
+
+# Reply cache: scammers repeat scripts, so the same conversation state + message
+# gets a stored reply instead of a model call.
+LLM_REPLY_CACHE_SIZE = int(os.getenv("LLM_REPLY_CACHE_SIZE", "10000"))  # keys; 0 = off
+LLM_REPLY_VARIANTS = int(os.getenv("LLM_REPLY_VARIANTS", "3"))  # model replies kept per key
+
+
+class ReplyCache:
+    """LRU of cache_key -> up to `variants` model replies.
+
+    A key only counts as a hit once all its variants are filled; until then the
+    model is called and each reply is added, so repeat visitors get varied wording.
+    """
+
+    def __init__(self, max_keys: int, variants: int):
+        self.max_keys = max_keys
+        self.variants = max(1, variants)
+        self._data: "OrderedDict[str, list[str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            replies = self._data.get(key)
+            if replies is None or len(replies) < self.variants:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return random.choice(replies)
+
+    def put(self, key: str, reply: str) -> None:
+        with self._lock:
+            replies = self._data.get(key)
+            if replies is None:
+                replies = self._data[key] = []
+            if len(replies) < self.variants:
+                replies.append(reply)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_keys:
+                self._data.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "keys": len(self._data),
+            "max_keys": self.max_keys,
+            "variants": self.variants,
+        }
+
+
+_REPLY_CACHE = ReplyCache(LLM_REPLY_CACHE_SIZE, LLM_REPLY_VARIANTS)
+
+# ✅ One pooled client per process (and one async client per event loop):
+# connections and TLS sessions are reused across replies.
+_client: OpenAI | None = None
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = (
+    weakref.WeakKeyDictionary()
+)
+_client_lock = threading.Lock()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_KEEPALIVE,
+        keepalive_expiry=LLM_KEEPALIVE_EXPIRY,
+    )
+
+
+def _client_kwargs(api_key: str) -> dict:
+    return {
+        "api_key": api_key,
+        # OPENAI_BASE_URL also lets tests point at a local fake server
+        "base_url": os.getenv("OPENAI_BASE_URL") or None,
+        # ✅ IMPORTANT: set a hard timeout so API never hangs
+        "timeout": LLM_TIMEOUT_SECONDS,
+        "max_retries": LLM_MAX_RETRIES,
+    }
+
+
+def get_client() -> OpenAI | None:
+    global _client
+    api_key = os.getenv("OPENAI_API_KEY")
+    if not api_key:
+        return None
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OpenAI(
+                    **_client_kwargs(api_key),
+                    http_client=httpx.Client(limits=_limits(), timeout=LLM_TIMEOUT_SECONDS),
+                )
+    return _client
+
+
+def get_async_client() -> AsyncOpenAI | None:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
-        return FALLBACK_REPLY
+        return None
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        client = AsyncOpenAI(
+            **_client_kwargs(api_key),
+            http_client=httpx.AsyncClient(limits=_limits(), timeout=LLM_TIMEOUT_SECONDS),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+def _async_slot() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    sem = _async_slots.get(loop)
+    if sem is None:
+        sem = asyncio.Semaphore(LLM_MAX_IN_FLIGHT)
+        _async_slots[loop] = sem
+    return sem
+
+
+def llm_stats() -> dict:
+    return {**_LLM_STATS, "breaker": _BREAKER.state, "reply_cache": _REPLY_CACHE.stats()}
+
+
+def _cached_reply(cache_key: str | None) -> str | None:
+    if not cache_key or LLM_REPLY_CACHE_SIZE <= 0:
+        return None
+    return _REPLY_CACHE.get(cache_key)
+
 
-    # ✅ IMPORTANT: set a hard timeout so API never hangs
-    client = OpenAI(api_key=api_key, timeout=8.0)
+def _remember_reply(cache_key: str | None, text: str) -> None:
+    if cache_key and text and LLM_REPLY_CACHE_SIZE > 0:
+        _REPLY_CACHE.put(cache_key, text)
 
+
+def _build_input(persona: str, history: list[dict], goal_hint: str) -> list[dict]:
     convo = []
     for m in history[-10:]:
         role = "user" if m.get("role") == "scammer" else "assistant"
@@ -29,15 +250,99 @@ def generate_honeypot_reply(persona: str, history: list[dict], goal_hint: str =
     system_msg = PERSONA_SYSTEM.get(persona, PERSONA_SYSTEM["confused_customer"])
     if goal_hint:
         system_msg = system_msg + " Goal: " + goal_hint
+    return [{"role": "system", "content": system_msg}, *convo]
+
+
+def _reply_text(resp, fallback: str, cache_key: str | None) -> str:
+    text = (resp.output_text or "").strip()
+    _remember_reply(cache_key, text)
+    return text if text else fallback
+
 
+def generate_honeypot_reply(
+    persona: str, history: list[dict], goal_hint: str = "",
+    fallback: str | None = None, cache_key: str | None = None,
+) -> str:
+    """Model-written reply; ``cache_key`` (conversation state + message) enables the reply cache."""
+    fallback = fallback or FALLBACK_REPLY
+    cached = _cached_reply(cache_key)
+    if cached is not None:
+        return cached
+
+    client = get_client()
+    if client is None:
+        return fallback
+
+    if not _SYNC_SLOTS.acquire(blocking=False):
+        _LLM_STATS["shed_concurrency"] += 1
+        return fallback
     try:
-        resp = client.responses.create(
-            model="gpt-4o-mini",
-            input=[{"role": "system", "content": system_msg}, *convo],
-        )
-        text = (resp.output_text or "").strip()
-        return text if text else FALLBACK_REPLY
+        if not _BREAKER.allow():
+            _LLM_STATS["shed_breaker"] += 1
+            return fallback
+
+        _LLM_STATS["calls"] += 1
+        start = time.monotonic()
+        ok = False
+        try:
+            resp = client.with_options(timeout=LLM_TURN_BUDGET_SECONDS, max_retries=0).responses.create(
+                model=LLM_MODEL,
+                input=_build_input(persona, history, goal_hint),
+            )
+            ok = True
+        except Exception:
+            # ✅ Always return quickly
+            _LLM_STATS["errors"] += 1
+            return fallback
+        finally:
+            # always recorded, so an abandoned half-open probe cannot leave the breaker stuck
+            _BREAKER.record(ok, time.monotonic() - start)
+
+        return _reply_text(resp, fallback, cache_key)
+    finally:
+        _SYNC_SLOTS.release()
+
+
+async def generate_honeypot_reply_async(
+    persona: str, history: list[dict], goal_hint: str = "",
+    fallback: str | None = None, cache_key: str | None = None,
+) -> str:
+    """Same as generate_honeypot_reply, but awaits the model instead of blocking a thread."""
+    fallback = fallback or FALLBACK_REPLY
+    cached = _cached_reply(cache_key)
+    if cached is not None:
+        return cached
+
+    client = get_async_client()
+    if client is None:
+        return fallback
+
+    slots = _async_slot()
+    if slots.locked():
+        _LLM_STATS["shed_concurrency"] += 1
+        return fallback
+    async with slots:
+        if not _BREAKER.allow():
+            _LLM_STATS["shed_breaker"] += 1
+            return fallback
+
+        _LLM_STATS["calls"] += 1
+        start = time.monotonic()
+        ok = False
+        try:
+            resp = await asyncio.wait_for(
+                client.responses.create(
+                    model=LLM_MODEL,
+                    input=_build_input(persona, history, goal_hint),
+                ),
+                timeout=LLM_TURN_BUDGET_SECONDS,
+            )
+            ok = True
+        except Exception:
+            _LLM_STATS["errors"] += 1
+            return fallback
+        finally:
+            # a cancelled call (CancelledError is a BaseException) counts as a failure
+            _BREAKER.record(ok, time.monotonic() - start)
 
-    except Exception:
-        # ✅ Always return quickly
-        return FALLBACK_REPLY
+        return _reply_text(resp, fallback, cache_key)
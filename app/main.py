@@ -1,18 +1,55 @@
 from __future__ import annotations
 
+import io
+import json
 import uuid
-from typing import Any, Dict, Optional
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
 from app.sessions import (
     create_session, serialize_session,
-    memory_lookup, memory_update
+    memory_lookup, memory_update, memory_stats, memory_intel, memory_nearest,
+    start_session_reaper, stop_session_reaper, session_stats, ioc_lookup
 )
-from app.honeypot import handle_incoming_scammer_message
-
-app = FastAPI(title="Agentic Honeypot Scam AI")
+from app.honeypot import handle_incoming_scammer_message_async
+from app.fastjson import body_schema, dumps, json_body, respond
+from app.llm_agent import llm_stats
+from app.memory import ioc_store_sizes
+from app.metrics import MetricsMiddleware, register_gauge, render_prometheus, stage
+from app.persistence import persistence_stats, start_persistence, stop_persistence
+from app.near_dup import NEAR_DUP_THRESHOLD
+from app.scoring import analyze_batch, analyze_message
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_persistence()
+    start_session_reaper()
+    yield
+    stop_session_reaper()
+    stop_persistence()
+
+
+app = FastAPI(title="Agentic Honeypot Scam AI", lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
+
+register_gauge("honeypot_sessions_active", "Sessions currently held.",
+               lambda: session_stats()["active"])
+register_gauge("honeypot_memory_entries", "Message memory records.",
+               lambda: memory_stats()["entries"])
+register_gauge("honeypot_memory_bytes", "Estimated message memory size.",
+               lambda: memory_stats()["bytes"])
+register_gauge("honeypot_near_dup_entries", "Messages in the near-duplicate index.",
+               lambda: memory_stats()["near_dup_entries"])
+register_gauge("honeypot_ioc_index_entries", "IOCs in the IOC -> messages/sessions index.",
+               lambda: memory_stats()["ioc_index_entries"])
+register_gauge("honeypot_iocs", "IOCs counted in the IOC store, by type.",
+               ioc_store_sizes, label="type")
 
 
 class AnalyzeIn(BaseModel):
@@ -27,137 +64,181 @@ class HoneypotStartIn(BaseModel):
 class HoneypotIncomingIn(BaseModel):
     session_id: str
     message: str
+    since: Optional[int] = None  # cursor from the previous response: send only what's new
+    summary: bool = False
+
 
+BATCH_CHUNK_SIZE = 512
 
-def analyze_message(text: str) -> Dict[str, Any]:
-    t = (text or "").lower()
-    reasons = []
-    score = 0.0
-    scam_type = "UNKNOWN"
-
-    has_pay = any(k in t for k in [
-        "pay", "payment", "upi", "upi id", "upi-id", "collect request",
-        "pin", "upi pin", "processing fee", "activate"
-    ])
-    has_reward = any(k in t for k in ["reward", "points", "redeem", "cashback", "expire", "expiring"])
-    has_urgency = any(k in t for k in ["today", "urgent", "immediately", "within", "expire", "fast", "now"])
-    has_delivery = any(k in t for k in ["parcel", "courier", "delivery", "shipment", "tracking", "reschedule"])
-    has_job = any(k in t for k in ["job", "work from home", "earn", "salary", "registration fee"])
-    has_utility = any(k in t for k in ["electricity", "power", "bill", "disconnect", "gas", "water"])
-    has_govt = any(k in t for k in ["subsidy", "government", "scheme", "benefit", "processing fee"])
-
-    if has_pay:
-        score += 0.3
-        reasons.append("keyword:pay")
-        scam_type = "UPI_PAYMENT"
-
-    if has_reward:
-        score += 0.3
-        reasons.append("pattern:reward_scam")
-        scam_type = "REWARD_SCAM"
-
-    if has_delivery:
-        score += 0.3
-        reasons.append("pattern:delivery_scam")
-        scam_type = "DELIVERY_SCAM"
-
-    if has_job:
-        score += 0.3
-        reasons.append("pattern:job_scam")
-        scam_type = "JOB_SCAM"
-
-    if has_utility:
-        score += 0.3
-        reasons.append("pattern:utility_scam")
-        scam_type = "UTILITY_SCAM"
-
-    if has_govt:
-        score += 0.3
-        reasons.append("pattern:govt_benefit_scam")
-        scam_type = "GOVT_BENEFIT_SCAM"
-
-    if has_urgency:
-        score += 0.2
-        reasons.append("pattern:urgency")
-
-    if "otp" in t or "upi pin" in t:
-        score += 0.2
-        reasons.append("pattern:credential_theft")
-        scam_type = "PHISHING"
-
-    if score > 1.0:
-        score = 1.0
-
-    is_scam = score >= 0.5
-
-    user_alert = None
-    recommended_actions = []
-    if is_scam:
-        user_alert = "⚠️ Suspicious message detected. Do NOT pay or share OTP/UPI PIN."
-        recommended_actions = [
-            "Do not click unknown links.",
-            "Do not approve UPI collect requests.",
-            "Verify through official website/app or customer care.",
-            "Report and block the sender."
-        ]
-
-    return {
-        "is_scam": is_scam,
-        "scam_score": float(score),
-        "scam_type": scam_type,
-        "reasons": reasons,
-        "user_alert": user_alert,
-        "recommended_actions": recommended_actions
-    }
-
-
-@app.post("/analyze")
-def analyze(payload: AnalyzeIn):
-    result = analyze_message(payload.message)
-
-    prev = memory_lookup(payload.message)
+
+def _with_memory(text: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    with stage("analyze.memory_lookup"):
+        prev = memory_lookup(text)
     memory_match = prev is not None
+    with stage("analyze.memory_nearest"):
+        near, similarity = memory_nearest(text)
 
-    rec = memory_update(payload.message, analyze_result=result)
+    with stage("analyze.memory_update"):
+        rec = memory_update(text, analyze_result=result)
 
     result["memory_match"] = memory_match
     result["seen_count"] = rec["count"]
     result["first_seen"] = rec["first_seen"]
     result["last_seen"] = rec["last_seen"]
-    result["previous_intel"] = rec["intel"]
+    result["previous_intel"] = memory_intel(rec)
+    result["similarity"] = round(similarity, 4)
+    result["template_match"] = near is not None and similarity >= NEAR_DUP_THRESHOLD
+    result["template_seen_count"] = near["count"] if near is not None else 0
     return result
 
 
-@app.post("/honeypot/start")
-def honeypot_start(payload: HoneypotStartIn):
+@app.post("/analyze", openapi_extra=body_schema(AnalyzeIn))
+def analyze(payload: AnalyzeIn = json_body(AnalyzeIn)):
+    with stage("analyze.rules"):
+        result = analyze_message(payload.message)
+    return respond(_with_memory(payload.message, result))
+
+
+def _score_chunk(start: int, items: List[Any]) -> str:
+    texts = []
+    for item in items:
+        if isinstance(item, dict):
+            item = item.get("message")
+        texts.append(item if isinstance(item, str) else None)
+
+    valid = [t for t in texts if t is not None]
+    scored = iter(analyze_batch(valid))
+
+    lines = []
+    for i, t in enumerate(texts):
+        if t is None:
+            out = {"index": start + i, "error": "invalid_item"}
+        else:
+            out = _with_memory(t, next(scored))
+            out["index"] = start + i
+        lines.append(dumps(out))
+    return "\n".join(lines) + "\n"
+
+
+def _iter_batch_items(body: bytes, ctype: str) -> Iterator[Any]:
+    if ctype.startswith("application/json"):
+        try:
+            items = json.loads(body or b"[]")
+        except ValueError:
+            items = None
+        if not isinstance(items, list):
+            yield None
+            return
+        yield from items
+        return
+
+    # NDJSON: one item per non-blank line, parsed as the chunks are scored
+    for line in io.BytesIO(body):
+        if line.strip():
+            yield _parse_ndjson_line(line)
+
+
+def _parse_ndjson_line(line: bytes) -> Any:
+    try:
+        return json.loads(line)
+    except ValueError:
+        return None
+
+
+@app.post("/analyze/batch")
+async def analyze_batch_endpoint(request: Request):
+    """Accepts a JSON array or an NDJSON body; replies with one NDJSON line per message."""
+    # ✅ read the body before streaming: StreamingResponse (ASGI < 2.4) listens on
+    # receive for client disconnects while it sends, and would take body chunks
+    body = await request.body()
+    items = _iter_batch_items(body, request.headers.get("content-type", ""))
+
+    async def results() -> AsyncIterator[str]:
+        chunk: List[Any] = []
+        start = 0
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= BATCH_CHUNK_SIZE:
+                yield await run_in_threadpool(_score_chunk, start, chunk)
+                start += len(chunk)
+                chunk = []
+        if chunk:
+            yield await run_in_threadpool(_score_chunk, start, chunk)
+
+    return StreamingResponse(results(), media_type="application/x-ndjson")
+
+
+# Honeypot turns are async so an LLM reply is awaited rather than holding a
+# worker thread; the state updates themselves still run in the threadpool.
+@app.post("/honeypot/start", openapi_extra=body_schema(HoneypotStartIn))
+async def honeypot_start(payload: HoneypotStartIn = json_body(HoneypotStartIn)):
     session_id = str(uuid.uuid4())
-    create_session(session_id, analyze_result=payload.analyze_result)
+    # ✅ store write (SQLite may wait on its lock) stays off the event loop
+    await run_in_threadpool(create_session, session_id, analyze_result=payload.analyze_result)
 
-    out = handle_incoming_scammer_message(session_id, payload.message)
+    out = await handle_incoming_scammer_message_async(session_id, payload.message)
 
-    return {
+    return respond({
         "session_id": session_id,
         "first_reply": out.get("reply"),
         "status": out.get("status"),
         "stop_reason": out.get("stop_reason"),
-        "session": serialize_session(session_id),
-    }
+        "session": await run_in_threadpool(serialize_session, session_id),
+    })
 
 
-@app.post("/honeypot/incoming")
-def honeypot_incoming(payload: HoneypotIncomingIn):
-    out = handle_incoming_scammer_message(payload.session_id, payload.message)
-    return {
+@app.post("/honeypot/incoming", openapi_extra=body_schema(HoneypotIncomingIn))
+async def honeypot_incoming(payload: HoneypotIncomingIn = json_body(HoneypotIncomingIn)):
+    out = await handle_incoming_scammer_message_async(payload.session_id, payload.message)
+    session = await run_in_threadpool(
+        serialize_session, payload.session_id, since=payload.since, summary=payload.summary
+    )
+    return respond({
         "reply": out.get("reply"),
         "status": out.get("status"),
         "stop_reason": out.get("stop_reason"),
-        "session": serialize_session(payload.session_id),
-    }
+        "session": session,
+    })
 
 
 @app.get("/honeypot/session/{session_id}")
-def honeypot_get_session(session_id: str):
-    s = serialize_session(session_id)
+def honeypot_get_session(session_id: str, since: Optional[int] = None, summary: bool = False):
+    s = serialize_session(session_id, since=since, summary=summary)
     if not s:
         return {"error": "session_not_found"}
-    return s
+    return respond(s)
+
+
+@app.get("/iocs/lookup")
+def ioc_lookup_endpoint(kind: str, value: str):
+    """Which messages and sessions used an IOC (kind: upi_ids, phone_numbers, links, domains)."""
+    out = ioc_lookup(kind, value)
+    if out is None:
+        return {"error": "unknown_ioc_kind"}
+    return respond(out)
+
+
+@app.get("/memory/stats")
+def memory_stats_endpoint():
+    return memory_stats()
+
+
+@app.get("/llm/stats")
+def llm_stats_endpoint():
+    return llm_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus text format: stage/endpoint latency histograms and store-size gauges."""
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/persistence/stats")
+def persistence_stats_endpoint():
+    return persistence_stats()
+
+
+@app.get("/sessions/stats")
+def sessions_stats_endpoint():
+    return session_stats()
@@ -1,43 +1,297 @@
-from collections import defaultdict
-from datetime import datetime
-from typing import Dict, List
+from array import array
+from datetime import datetime, timezone
+from functools import lru_cache
+from operator import itemgetter
+from typing import Dict, Iterator, List, Optional, Tuple
+import heapq
+import os
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:  # seen_since falls back to a plain scan
+    np = None
+
+from app.persistence import register_namespace
+from app.sketches import CountMinSketch, HyperLogLog, hash64
+from app.store import StripedLock, shared_ioc_store
 
 # In-memory IOC store
-# Later you can replace this with PostgreSQL
+# With STATE_BACKEND=sqlite the counters live in a shared table instead (see app/store.py)
+_SHARED = shared_ioc_store()
+
+def _fmt_ts(ts: int) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class IocColumns:
+    """IOCs of one type, column-wise: value -> row id, then count / first_seen /
+    last_seen (epoch seconds) in typed arrays. Timestamps are formatted only
+    when a row is serialized.
+
+    Reads like a read-only ``{value: count}`` dict (``in``, ``[]``, ``items()``).
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._values: List[str] = []
+        self._counts = array("q")
+        self._first_seen = array("q")
+        self._last_seen = array("q")
+        self._lock = threading.Lock()  # guards appends (and buffer views, see seen_since)
+
+    def add(self, v: str, now: int, start: int = 0) -> int:
+        """Count one sighting; new values start at ``start`` (or 1). Returns the new count.
+
+        Callers hold the value's stripe lock, so updates to one row never race.
+        """
+        i = self._ids.get(v)
+        if i is None:
+            with self._lock:
+                i = len(self._values)
+                self._values.append(v)
+                self._counts.append(max(1, start))
+                self._first_seen.append(now)
+                self._last_seen.append(now)
+                self._ids[v] = i  # last: the row is complete once it is findable
+            return self._counts[i]
+        self._counts[i] += 1
+        self._last_seen[i] = now
+        return self._counts[i]
+
+    def set_row(self, v: str, count: int, first_seen: int, last_seen: int) -> None:
+        """Overwrite (or create) a row, e.g. when restoring persisted state."""
+        i = self._ids.get(v)
+        if i is None:
+            with self._lock:
+                i = len(self._values)
+                self._values.append(v)
+                self._counts.append(count)
+                self._first_seen.append(first_seen)
+                self._last_seen.append(last_seen)
+                self._ids[v] = i
+            return
+        self._counts[i] = count
+        self._first_seen[i] = first_seen
+        self._last_seen[i] = last_seen
+
+    def row(self, v: str) -> Optional[Tuple[int, int, int]]:
+        """(count, first_seen, last_seen) for a value, or None."""
+        i = self._ids.get(v)
+        if i is None:
+            return None
+        return self._counts[i], self._first_seen[i], self._last_seen[i]
+
+    def seen_since(self, ts: int) -> List[str]:
+        """Values whose last sighting is at or after epoch ``ts``."""
+        with self._lock:
+            if np is not None:
+                last = np.frombuffer(self._last_seen, dtype=np.int64)
+                idx = np.flatnonzero(last >= ts).tolist()
+                del last  # release the buffer so appends can resize again
+            else:
+                idx = [i for i, t in enumerate(self._last_seen) if t >= ts]
+            values = self._values
+            return [values[i] for i in idx]
+
+    def items(self) -> Iterator[Tuple[str, int]]:
+        values, counts = self._values, self._counts
+        for i in range(len(self._ids)):  # complete rows only
+            yield values[i], counts[i]
+
+    def __getitem__(self, v: str) -> int:
+        return self._counts[self._ids[v]]
+
+    def __contains__(self, v: str) -> bool:
+        return v in self._ids
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+
 IOC_MEMORY = {
-    "upi_ids": defaultdict(int),
-    "domains": defaultdict(int),
-    "phishing_links": defaultdict(int),
-    "phone_numbers": defaultdict(int),
+    "upi_ids": IocColumns(),
+    "domains": IocColumns(),
+    "phishing_links": IocColumns(),
+    "phone_numbers": IocColumns(),
 }
 
-IOC_TIMESTAMPS = {
-    "upi_ids": {},
-    "domains": {},
-    "phishing_links": {},
-    "phone_numbers": {},
-}
+# (ioc_type, value) -> lock for the count/last_seen read-modify-write
+_IOC_LOCKS = StripedLock()
+
+IOC_TOP_K = int(os.getenv("IOC_TOP_K", "100"))  # largest limit served without a full sort
+
+
+class TopK:
+    """Exact top-K for counters that only go up.
+
+    Invariant: no counter outside the kept set is larger than the smallest
+    kept one, so an increment can only ever swap that smallest one out.
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self._counts: Dict[tuple, int] = {}
+        self._min_key = None
+        self._lock = threading.Lock()
+
+    def update(self, key: tuple, count: int) -> None:
+        with self._lock:
+            counts = self._counts
+            if key in counts:
+                counts[key] = count
+                if key == self._min_key:
+                    self._min_key = None
+            elif len(counts) < self.capacity:
+                counts[key] = count
+                if self._min_key is not None and count < counts[self._min_key]:
+                    self._min_key = key
+            else:
+                min_key = self._min()
+                if count > counts[min_key]:
+                    del counts[min_key]
+                    counts[key] = count
+                    self._min_key = None
+
+    def _min(self) -> tuple:
+        if self._min_key is None:
+            self._min_key = min(self._counts, key=self._counts.get)
+        return self._min_key
+
+    def top(self, limit: int) -> List[tuple]:
+        with self._lock:
+            return heapq.nlargest(limit, self._counts.items(), key=itemgetter(1))
+
+
+_TOP = TopK(IOC_TOP_K)
+_TOP_BY_TYPE = {ioc_type: TopK(IOC_TOP_K) for ioc_type in IOC_MEMORY}
+
+# -----------------------------
+# Approximate mode (IOC_APPROX=1, in-process store only)
+# -----------------------------
+# Every sighting goes into a Count-Min sketch and per-type / per-day
+# HyperLogLogs; only IOCs whose estimated count reaches the threshold get an
+# exact IOC_MEMORY entry (starting from the estimate). Memory stays bounded no
+# matter how many one-off phone numbers and links arrive.
+IOC_APPROX = os.getenv("IOC_APPROX", "0") == "1"
+IOC_APPROX_EXACT_THRESHOLD = int(os.getenv("IOC_APPROX_EXACT_THRESHOLD", "3"))
+# per-day distinct counts kept; at least today's (0 would disable pruning below)
+IOC_APPROX_DAYS = max(1, int(os.getenv("IOC_APPROX_DAYS", "30")))
+
+_CMS = CountMinSketch(
+    width=int(os.getenv("IOC_CMS_WIDTH", str(1 << 18))),
+    depth=int(os.getenv("IOC_CMS_DEPTH", "4")),
+) if IOC_APPROX else None
+_HLL = {ioc_type: HyperLogLog() for ioc_type in IOC_MEMORY} if IOC_APPROX else {}
+_HLL_BY_DAY: Dict[str, Dict[str, HyperLogLog]] = {}  # "YYYY-MM-DD" -> type -> HLL
+_HLL_LOCK = threading.Lock()
+
+
+@lru_cache(maxsize=64)
+def _day(epoch_day: int) -> str:
+    return _fmt_ts(epoch_day * 86400)[:10]
+
+
+def _ioc_hash(ioc_type: str, v: str) -> int:
+    return hash64(ioc_type + ":" + v)
+
+
+def _day_hlls(day: str) -> Dict[str, HyperLogLog]:
+    with _HLL_LOCK:
+        hlls = _HLL_BY_DAY.get(day)
+        if hlls is None:
+            hlls = _HLL_BY_DAY[day] = {ioc_type: HyperLogLog() for ioc_type in IOC_MEMORY}
+            for old in sorted(_HLL_BY_DAY)[:-IOC_APPROX_DAYS]:
+                del _HLL_BY_DAY[old]
+        return hlls
+
+
+def ioc_cardinality() -> Dict[str, object]:
+    """Distinct IOCs per type (estimates in approximate mode, plus per-day estimates)."""
+    if not IOC_APPROX:
+        return {"approx": False, "by_type": {t: len(v) for t, v in IOC_MEMORY.items()}, "by_day": {}}
+    with _HLL_LOCK:
+        by_day = {
+            day: {t: hll.count() for t, hll in hlls.items()}
+            for day, hlls in sorted(_HLL_BY_DAY.items())
+        }
+    return {
+        "approx": True,
+        "by_type": {t: hll.count() for t, hll in _HLL.items()},
+        "by_day": by_day,
+        "tracked_exactly": {t: len(v) for t, v in IOC_MEMORY.items()},
+    }
+
+
+def _count_exact(ioc_type: str, v: str, now: int, start: int = 0) -> None:
+    with _IOC_LOCKS((ioc_type, v)):
+        count = IOC_MEMORY[ioc_type].add(v, now, start)
+        _TOP.update((ioc_type, v), count)
+        _TOP_BY_TYPE[ioc_type].update((ioc_type, v), count)
+    if _PERSIST_MARK is not None:
+        _PERSIST_MARK((ioc_type, v))
+
+
+# -----------------------------
+# Warm restarts (PERSIST_DIR, see app/persistence.py)
+# -----------------------------
+# Exact rows only; approximate-mode sketches start empty after a restart.
+def _persisted_row(key: tuple):
+    ioc_type, v = key
+    return IOC_MEMORY[ioc_type].row(v)
+
+
+def _restore_row(key: tuple, row) -> None:
+    ioc_type, v = key
+    if row is None:
+        return  # rows are never deleted
+    IOC_MEMORY[ioc_type].set_row(v, *row)
+    _TOP.update(key, row[0])
+    _TOP_BY_TYPE[ioc_type].update(key, row[0])
+
+
+def _all_rows() -> List[tuple]:
+    return [(t, v) for t, columns in IOC_MEMORY.items() for v, _ in columns.items()]
+
+
+_PERSIST_MARK = (
+    register_namespace("iocs", _persisted_row, _restore_row, _all_rows, _IOC_LOCKS)
+    if _SHARED is None else None
+)
+
+
+def _count_approx(ioc_type: str, values: List[str], now: int) -> None:
+    day_hll = _day_hlls(_day(now // 86400))[ioc_type]
+    type_hll = _HLL[ioc_type]
+    for v in values:
+        h = _ioc_hash(ioc_type, v)
+        estimate = _CMS.add(h)
+        type_hll.add(h)
+        day_hll.add(h)
+        if v in IOC_MEMORY[ioc_type] or estimate >= IOC_APPROX_EXACT_THRESHOLD:
+            _count_exact(ioc_type, v, now, start=estimate)
 
 # -----------------------------
 # Store extracted intelligence
 # -----------------------------
 def store_iocs(iocs: Dict[str, List[str]]):
-    now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    now = int(time.time())
 
     for ioc_type, values in iocs.items():
         if ioc_type not in IOC_MEMORY:
             continue
 
-        for v in values:
-            IOC_MEMORY[ioc_type][v] += 1
+        if _SHARED is not None:
+            _SHARED.add(ioc_type, values, _fmt_ts(now))
+            continue
 
-            if v not in IOC_TIMESTAMPS[ioc_type]:
-                IOC_TIMESTAMPS[ioc_type][v] = {
-                    "first_seen": now,
-                    "last_seen": now,
-                }
-            else:
-                IOC_TIMESTAMPS[ioc_type][v]["last_seen"] = now
+        if IOC_APPROX:
+            _count_approx(ioc_type, values, now)
+            continue
+
+        for v in values:
+            _count_exact(ioc_type, v, now)
 
 # -----------------------------
 # Match incoming text IOCs
@@ -55,7 +309,13 @@ def match_any_ioc(iocs: Dict[str, List[str]]) -> Dict[str, List[str]]:
             continue
 
         for v in values:
-            if v in IOC_MEMORY[ioc_type]:
+            if _SHARED is not None:
+                if _SHARED.contains(ioc_type, v):
+                    hits[ioc_type].append(v)
+            elif v in IOC_MEMORY[ioc_type]:
+                hits[ioc_type].append(v)
+            elif IOC_APPROX and _CMS.estimate(_ioc_hash(ioc_type, v)) > 0:
+                # seen below the exact-tracking threshold (rare false positives)
                 hits[ioc_type].append(v)
 
     return hits
@@ -70,19 +330,65 @@ def memory_match(iocs: Dict[str, List[str]]) -> bool:
 # -----------------------------
 # Get top known IOCs
 # -----------------------------
-def get_top_iocs(limit: int = 10):
+def _ioc_row(ioc_type: str, v: str) -> dict:
+    count, first_seen, last_seen = IOC_MEMORY[ioc_type].row(v)
+    return {
+        "type": ioc_type[:-1],  # remove plural
+        "value": v,
+        "count": count,
+        "first_seen": _fmt_ts(first_seen),
+        "last_seen": _fmt_ts(last_seen),
+    }
+
+
+def get_top_iocs(limit: int = 10, ioc_type: Optional[str] = None):
+    """Most-seen IOCs, overall or for one type (``upi_ids``, ``domains``, ...)."""
+    if ioc_type is not None and ioc_type not in IOC_MEMORY:
+        return []
+
+    if _SHARED is not None:
+        return _SHARED.top(limit, ioc_type)
+
+    # ✅ O(K): served from the maintained top-K, no scan of every IOC
+    if limit <= IOC_TOP_K:
+        top = _TOP if ioc_type is None else _TOP_BY_TYPE[ioc_type]
+        return [_ioc_row(t, v) for (t, v), _ in top.top(limit)]
+
     results = []
 
-    for ioc_type, values in IOC_MEMORY.items():
-        for v, count in values.items():
-            meta = IOC_TIMESTAMPS[ioc_type].get(v, {})
-            results.append({
-                "type": ioc_type[:-1],  # remove plural
-                "value": v,
-                "count": count,
-                "first_seen": meta.get("first_seen"),
-                "last_seen": meta.get("last_seen"),
-            })
+    for t, values in IOC_MEMORY.items():
+        if ioc_type is not None and t != ioc_type:
+            continue
+        for v, _ in values.items():
+            results.append(_ioc_row(t, v))
 
     results.sort(key=lambda x: x["count"], reverse=True)
     return results[:limit]
+
+
+def ioc_store_sizes() -> Dict[str, int]:
+    """IOCs held per type (a single "all" total for the shared store)."""
+    if _SHARED is not None:
+        return {"all": len(_SHARED)}
+    return {t: len(v) for t, v in IOC_MEMORY.items()}
+
+
+# -----------------------------
+# Recently seen IOCs
+# -----------------------------
+def get_recent_iocs(seconds: int = 86400, ioc_type: Optional[str] = None):
+    """IOCs last seen within the window (e.g. the last 24h), most-seen first."""
+    if ioc_type is not None and ioc_type not in IOC_MEMORY:
+        return []
+    since = int(time.time()) - int(seconds)
+    if _SHARED is not None:
+        return _SHARED.seen_since(_fmt_ts(since), ioc_type)
+
+    results = []
+    for t, columns in IOC_MEMORY.items():
+        if ioc_type is not None and t != ioc_type:
+            continue
+        results.extend(_ioc_row(t, v) for v in columns.seen_since(since))
+
+    results.sort(key=lambda x: x["count"], reverse=True)
+    return results
@@ -0,0 +1,192 @@
+from __future__ import annotations
+from bisect import bisect_left
+from typing import Callable, Dict, List, Tuple
+import os
+import threading
+import time
+
+# -----------------------------
+# In-process latency metrics
+# -----------------------------
+# Fixed-bucket histograms per pipeline stage and per endpoint, rendered in the
+# Prometheus text format at GET /metrics. Observing is a bisect and two adds.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+
+# seconds; roughly x2.5 apart from 25µs to 10s
+BUCKETS: Tuple[float, ...] = (
+    0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot = +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        i = bisect_left(self.buckets, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimate by linear interpolation inside the bucket holding the q-th observation."""
+        with self._lock:
+            counts = list(self.counts)
+            total = self.count
+        if total == 0:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, c in enumerate(counts):
+            if c and seen + c >= rank:
+                lo = self.buckets[i - 1] if i > 0 else 0.0
+                hi = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lo + (hi - lo) * (rank - seen) / c
+            seen += c
+        return self.buckets[-1]
+
+
+_STAGES: Dict[str, Histogram] = {}
+_REQUESTS: Dict[str, Histogram] = {}
+_STATUS: Dict[Tuple[str, int], int] = {}
+_GAUGES: List[Tuple[str, str, str, Callable]] = []  # (name, help, label, fn)
+_LOCK = threading.Lock()
+
+
+def _histogram(table: Dict[str, Histogram], key: str) -> Histogram:
+    h = table.get(key)
+    if h is None:
+        with _LOCK:
+            h = table.setdefault(key, Histogram())
+    return h
+
+
+def observe_stage(name: str, seconds: float) -> None:
+    if METRICS_ENABLED:
+        _histogram(_STAGES, name).observe(seconds)
+
+
+class _StageTimer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        _histogram(_STAGES, self.name).observe(time.perf_counter() - self.start)
+        return False
+
+
+class _NoTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_TIMER = _NoTimer()
+
+
+def stage(name: str):
+    """``with stage("honeypot.extract"): ...`` records the block's latency."""
+    return _StageTimer(name) if METRICS_ENABLED else _NO_TIMER
+
+
+def register_gauge(name: str, help_text: str, fn: Callable, label: str = "") -> None:
+    """Gauge read at scrape time; ``fn`` returns a number, or {label_value: number} with ``label``."""
+    _GAUGES.append((name, help_text, label, fn))
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware timing every HTTP request by route template and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # the router stores the matched route in scope; templates keep label cardinality low
+            route = scope.get("route")
+            endpoint = f'{scope["method"]} {getattr(route, "path", "unmatched")}'
+            _histogram(_REQUESTS, endpoint).observe(time.perf_counter() - start)
+            with _LOCK:
+                _STATUS[(endpoint, status)] = _STATUS.get((endpoint, status), 0) + 1
+
+
+def _esc(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+def _render_histograms(lines: List[str], name: str, label: str, table: Dict[str, Histogram]) -> None:
+    lines.append(f"# TYPE {name} histogram")
+    for key, h in sorted(table.items()):
+        lv = f'{label}="{_esc(key)}"'
+        cumulative = 0
+        for bound, c in zip(h.buckets, h.counts):
+            cumulative += c
+            lines.append(f'{name}_bucket{{{lv},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{lv},le="+Inf"}} {h.count}')
+        lines.append(f"{name}_sum{{{lv}}} {h.sum!r}")
+        lines.append(f"{name}_count{{{lv}}} {h.count}")
+
+    qname = name.replace("_seconds", "_quantile_seconds")
+    lines.append(f"# TYPE {qname} gauge")
+    for key, h in sorted(table.items()):
+        for q in QUANTILES:
+            lines.append(f'{qname}{{{label}="{_esc(key)}",quantile="{q}"}} {h.quantile(q)!r}')
+
+
+def render_prometheus() -> str:
+    lines: List[str] = []
+    lines.append("# HELP honeypot_stage_seconds Latency of one pipeline stage.")
+    _render_histograms(lines, "honeypot_stage_seconds", "stage", _STAGES)
+    lines.append("# HELP honeypot_request_seconds HTTP request latency by endpoint.")
+    _render_histograms(lines, "honeypot_request_seconds", "endpoint", _REQUESTS)
+
+    lines.append("# TYPE honeypot_requests_total counter")
+    with _LOCK:
+        status_counts = sorted(_STATUS.items())
+    for (endpoint, status), c in status_counts:
+        lines.append(f'honeypot_requests_total{{endpoint="{_esc(endpoint)}",status="{status}"}} {c}')
+
+    for name, help_text, label, fn in _GAUGES:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} gauge")
+        value = fn()
+        if isinstance(value, dict):
+            for lv, v in sorted(value.items()):
+                lines.append(f'{name}{{{label}="{_esc(lv)}"}} {_fmt(v)}')
+        else:
+            lines.append(f"{name} {_fmt(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,149 @@
+from __future__ import annotations
+from array import array
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import os
+import random
+import re
+import threading
+import zlib
+
+try:
+    import numpy as np
+except ImportError:  # signatures fall back to a per-permutation Python loop
+    np = None
+
+# -----------------------------
+# Near-duplicate (template) matching
+# -----------------------------
+# MinHash signatures over word shingles + LSH banding: messages from the same
+# scam template (different amount, name or UPI ID) land in a shared bucket, so
+# the nearest seen template is found without scanning every record.
+NEAR_DUP_MAX_ENTRIES = int(os.getenv("NEAR_DUP_MAX_ENTRIES", "50000"))  # ~2 KB each
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.6"))  # similarity counted as same template
+
+NUM_PERM = 64
+BANDS = 16  # 16 bands x 4 rows: pairs above ~0.5 similarity almost always share a bucket
+ROWS = NUM_PERM // BANDS
+BUCKET_CAP = 32  # a crowded bucket already has enough representatives of its template
+
+# 32-bit shingle hashes and a 31-bit prime: a * x + b < 2**63, so all 64
+# permutations run as one uint64 matrix expression (~30us for a 250-word message)
+_PRIME = (1 << 31) - 1
+_rng = random.Random(1337)  # fixed: signatures must agree across restarts and workers
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+if np is not None:
+    _PERM_A = np.array([a for a, _ in _PERMS], dtype=np.uint64)[:, None]
+    _PERM_B = np.array([b for _, b in _PERMS], dtype=np.uint64)[:, None]
+
+_TOKEN_RE = re.compile(r"\w+")
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def _shingles(text: str) -> set:
+    # amounts, phone numbers and reference IDs vary between copies of a template
+    tokens = _TOKEN_RE.findall(_DIGITS_RE.sub("0", (text or "").lower()))
+    if len(tokens) < 2:
+        return set(tokens)
+    return {a + " " + b for a, b in zip(tokens, tokens[1:])}
+
+
+def _hash32(s: str) -> int:
+    return zlib.crc32(s.encode("utf-8"))
+
+
+@lru_cache(maxsize=1024)
+def minhash(text: str) -> bytes:
+    """64 x 32-bit MinHash signature of a message (cached: lookup and update hash the same text)."""
+    xs = [_hash32(s) for s in _shingles(text)] or [0]
+    if np is None:
+        return array("I", (min((a * x + b) % _PRIME for x in xs) for a, b in _PERMS)).tobytes()
+    x = np.array(xs, dtype=np.uint64)
+    return ((_PERM_A * x + _PERM_B) % _PRIME).min(axis=1).astype(np.uint32).tobytes()
+
+
+def similarity(sig_a: bytes, sig_b: bytes) -> float:
+    """Estimated Jaccard similarity: share of signature slots that agree."""
+    a, b = array("I", sig_a), array("I", sig_b)
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERM
+
+
+def _band_keys(sig: bytes) -> List[int]:
+    width = ROWS * 4
+    return [hash((i, sig[i * width:(i + 1) * width])) for i in range(BANDS)]
+
+
+class MinHashIndex:
+    """Bounded LSH index of key -> signature, oldest-added evicted first.
+
+    Buckets hold a single key (the common case) or a short list of keys.
+    """
+
+    def __init__(self, max_entries: int = NEAR_DUP_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._sigs: "OrderedDict[str, bytes]" = OrderedDict()
+        self._buckets: Dict[int, object] = {}
+        self._lock = threading.Lock()
+
+    def add(self, key: str, text: str) -> None:
+        sig = minhash(text)
+        with self._lock:
+            if key in self._sigs:
+                self._sigs.move_to_end(key)
+                return
+            self._sigs[key] = sig
+            for bk in _band_keys(sig):
+                cur = self._buckets.get(bk)
+                if cur is None:
+                    self._buckets[bk] = key
+                elif isinstance(cur, str):
+                    self._buckets[bk] = [cur, key]
+                elif len(cur) < BUCKET_CAP:
+                    cur.append(key)
+            while self.max_entries > 0 and len(self._sigs) > self.max_entries:
+                old_key, _ = next(iter(self._sigs.items()))
+                self._remove(old_key)
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        sig = self._sigs.pop(key, None)
+        if sig is None:
+            return
+        for bk in _band_keys(sig):
+            cur = self._buckets.get(bk)
+            if cur == key:
+                del self._buckets[bk]
+            elif isinstance(cur, list) and key in cur:
+                cur.remove(key)
+                if len(cur) == 1:
+                    self._buckets[bk] = cur[0]
+
+    def nearest(self, key: str, text: str) -> Optional[Tuple[str, float]]:
+        """Most similar indexed key (``key`` itself scores 1.0), or None if no bucket is shared."""
+        with self._lock:
+            if key in self._sigs:
+                return key, 1.0
+            sig = minhash(text)
+            candidates = set()
+            for bk in _band_keys(sig):
+                cur = self._buckets.get(bk)
+                if cur is None:
+                    continue
+                if isinstance(cur, str):
+                    candidates.add(cur)
+                else:
+                    candidates.update(cur)
+            best = None
+            for other in candidates:
+                sim = similarity(sig, self._sigs[other])
+                if best is None or sim > best[1]:
+                    best = (other, sim)
+            return best
+
+    def __len__(self) -> int:
+        return len(self._sigs)
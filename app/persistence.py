@@ -0,0 +1,329 @@
+from __future__ import annotations
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+import gc
+import glob
+import logging
+import mmap
+import os
+import pickle
+import struct
+import threading
+import time
+
+from app.store import STATE_BACKEND
+
+try:
+    import fcntl
+except ImportError:  # no advisory locks (Windows): one process per PERSIST_DIR is up to you
+    fcntl = None
+
+# -----------------------------
+# Snapshot + append-only log (warm restarts of in-process state)
+# -----------------------------
+# PERSIST_DIR=<dir> (with STATE_BACKEND=memory) keeps sessions, message memory
+# and IOC counters across restarts. Stores only *mark* changed keys; a
+# background thread writes the current value of each marked key to the log, so
+# a hot key costs one record per flush however often it changes. Snapshots are
+# taken periodically and old logs dropped. Both files are length-prefixed
+# pickled frames, read back through mmap on startup. A directory belongs to one
+# process (an exclusive lock file), so run a single worker or one dir per worker.
+PERSIST_DIR = os.getenv("PERSIST_DIR", "")
+PERSIST_FLUSH_SECONDS = float(os.getenv("PERSIST_FLUSH_SECONDS", "1.0"))
+PERSIST_SNAPSHOT_SECONDS = float(os.getenv("PERSIST_SNAPSHOT_SECONDS", "300"))
+PERSIST_FSYNC = os.getenv("PERSIST_FSYNC", "0") == "1"
+
+PERSIST_ENABLED = bool(PERSIST_DIR) and STATE_BACKEND == "memory"
+
+logger = logging.getLogger(__name__)
+
+_FRAME_LEN = struct.Struct("<I")
+_FRAME_RECORDS = 10000  # records per frame in snapshots
+
+
+class _Namespace:
+    __slots__ = ("name", "get", "apply", "keys", "lock_for")
+
+    def __init__(self, name, get, apply, keys, lock_for):
+        self.name = name
+        self.get = get  # key -> value, or None once deleted
+        self.apply = apply  # (key, value or None) -> None, used on replay
+        self.keys = keys  # () -> iterable of every live key, for snapshots
+        self.lock_for = lock_for  # key -> lock held while the value is read and pickled
+
+
+def _read_frames(path: str) -> Iterator[list]:
+    """Frames of a snapshot or log file; stops quietly at a torn tail from a crash."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = 0
+            while pos + _FRAME_LEN.size <= size:
+                (n,) = _FRAME_LEN.unpack_from(mm, pos)
+                start = pos + _FRAME_LEN.size
+                if start + n > size:
+                    break
+                try:
+                    frame = pickle.loads(mm[start:start + n])
+                except Exception:
+                    break
+                yield frame
+                pos = start + n
+
+
+def _write_frame(f, records: list) -> None:
+    payload = pickle.dumps(records, pickle.HIGHEST_PROTOCOL)
+    f.write(_FRAME_LEN.pack(len(payload)))
+    f.write(payload)
+
+
+class Persistence:
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._namespaces: Dict[str, _Namespace] = {}
+        self._pending: set = set()
+        self._pending_lock = threading.Lock()
+        self._loading = False
+        self._seq = 0
+        self._log = None
+        self._dir_lock = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {
+            "loaded_records": 0, "load_seconds": 0.0,
+            "logged_records": 0, "snapshots": 0, "last_snapshot": None,
+            "errors": 0, "last_error": None,
+        }
+
+    def register(self, name: str, get: Callable, apply: Callable, keys: Callable,
+                 lock_for: Callable | None = None) -> Callable[[Any], None]:
+        """Add a namespace; returns the mark(key) function its store calls on every change."""
+        self._namespaces[name] = _Namespace(name, get, apply, keys, lock_for)
+
+        def mark(key: Any) -> None:
+            if not self._loading:
+                with self._pending_lock:
+                    self._pending.add((name, key))
+
+        return mark
+
+    # ---- files
+
+    def _path(self, kind: str, seq: int) -> str:
+        return os.path.join(self.directory, f"{kind}-{seq:08d}.bin")
+
+    def _seqs(self, kind: str) -> List[int]:
+        out = []
+        for p in glob.glob(os.path.join(self.directory, f"{kind}-*.bin")):
+            try:
+                out.append(int(os.path.basename(p)[len(kind) + 1:-4]))
+            except ValueError:
+                continue
+        return sorted(out)
+
+    def _encode(self, ns: _Namespace, key: Any) -> Tuple[str, Any, bytes | None]:
+        if ns.lock_for is None:
+            value = ns.get(key)
+            blob = None if value is None else pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        else:
+            with ns.lock_for(key):
+                value = ns.get(key)
+                blob = None if value is None else pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        return ns.name, key, blob
+
+    # ---- startup
+
+    def _lock_directory(self) -> None:
+        """Claim the directory; another process appending to the same logs would corrupt them."""
+        if self._dir_lock is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        f = open(os.path.join(self.directory, "lock"), "a+b")
+        if fcntl is not None:
+            try:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                raise RuntimeError(
+                    f"PERSIST_DIR {self.directory!r} is in use by another process; "
+                    "give each worker its own directory or run a single worker"
+                ) from None
+        self._dir_lock = f
+
+    def _unlock_directory(self) -> None:
+        if self._dir_lock is not None:
+            self._dir_lock.close()  # closing drops the flock
+            self._dir_lock = None
+
+    def load(self) -> int:
+        """Latest snapshot, then every log from its sequence on. Returns records applied."""
+        self._lock_directory()
+        start = time.perf_counter()
+        snapshots = self._seqs("snapshot")
+        base = snapshots[-1] if snapshots else 0
+        files = [self._path("snapshot", base)] if snapshots else []
+        files += [self._path("log", s) for s in self._seqs("log") if s >= base]
+
+        applied = 0
+        self._loading = True
+        # millions of new containers would otherwise trigger a cyclic GC pass every few thousand
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            for path in files:
+                for frame in _read_frames(path):
+                    for name, key, blob in frame:
+                        ns = self._namespaces.get(name)
+                        if ns is None:
+                            continue
+                        ns.apply(key, None if blob is None else pickle.loads(blob))
+                        applied += 1
+        finally:
+            self._loading = False
+            if gc_was_enabled:
+                gc.enable()
+
+        self._seq = max([base] + self._seqs("log"))
+        self.stats["loaded_records"] = applied
+        self.stats["load_seconds"] = round(time.perf_counter() - start, 3)
+        return applied
+
+    # ---- background writer
+
+    def flush(self) -> int:
+        with self._pending_lock:
+            pending, self._pending = self._pending, set()
+        if not pending:
+            return 0
+        try:
+            records = [self._encode(self._namespaces[name], key) for name, key in pending]
+            _write_frame(self._log, records)
+            self._log.flush()
+            if PERSIST_FSYNC:
+                os.fsync(self._log.fileno())
+        except BaseException:
+            # retry these keys next time, in a fresh log: this one may end in a torn frame
+            with self._pending_lock:
+                self._pending |= pending
+            self._open_log(self._seq + 1)
+            raise
+        self.stats["logged_records"] += len(records)
+        return len(records)
+
+    def _open_log(self, seq: int) -> None:
+        if self._log is not None:
+            self._log.close()
+        self._seq = seq
+        self._log = open(self._path("log", seq), "ab")
+
+    def snapshot(self) -> None:
+        """Rotate the log, write the full state, then drop older snapshots and logs.
+
+        The new log is opened before the state is read, so snapshot N plus log N
+        (replayed on top; records hold whole values) always covers everything.
+        """
+        self.flush()
+        seq = self._seq + 1
+        self._open_log(seq)
+
+        tmp = self._path("snapshot", seq) + ".tmp"
+        try:
+            with open(tmp, "wb") as f:
+                batch = []
+                for ns in self._namespaces.values():
+                    for key in ns.keys():
+                        rec = self._encode(ns, key)
+                        if rec[2] is None:
+                            continue
+                        batch.append(rec)
+                        if len(batch) >= _FRAME_RECORDS:
+                            _write_frame(f, batch)
+                            batch = []
+                if batch:
+                    _write_frame(f, batch)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self._path("snapshot", seq))
+        except BaseException:
+            # the previous snapshot and every log since are still in place
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+        for s in self._seqs("snapshot"):
+            if s < seq:
+                os.remove(self._path("snapshot", s))
+        for s in self._seqs("log"):
+            if s < seq:
+                os.remove(self._path("log", s))
+        self.stats["snapshots"] += 1
+        self.stats["last_snapshot"] = time.time()
+
+    def _attempt(self, step: Callable[[], Any]) -> None:
+        # a full disk or an unpicklable value must not kill the writer thread
+        try:
+            step()
+        except Exception as e:
+            self.stats["errors"] += 1
+            self.stats["last_error"] = f"{step.__name__}: {e!r}"
+            logger.exception("state persistence %s failed", step.__name__)
+
+    def _loop(self) -> None:
+        # compact whatever was replayed into a fresh snapshot first
+        self._attempt(self.snapshot)
+        last_snapshot = time.monotonic()
+        while not self._stop.wait(PERSIST_FLUSH_SECONDS):
+            self._attempt(self.flush)
+            if time.monotonic() - last_snapshot >= PERSIST_SNAPSHOT_SECONDS:
+                self._attempt(self.snapshot)
+                last_snapshot = time.monotonic()
+        self._attempt(self.flush)
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._lock_directory()
+        self._open_log(self._seq)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="state-persistence", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        self._unlock_directory()
+
+
+PERSISTENCE: Optional[Persistence] = Persistence(PERSIST_DIR) if PERSIST_ENABLED else None
+
+
+def register_namespace(name: str, get: Callable, apply: Callable, keys: Callable[[], Iterable],
+                       lock_for: Callable | None = None) -> Callable[[Any], None] | None:
+    """Persist one piece of state; returns its mark(key) hook, or None when persistence is off."""
+    if PERSISTENCE is None:
+        return None
+    return PERSISTENCE.register(name, get, apply, keys, lock_for)
+
+
+def start_persistence() -> None:
+    """Restore state from PERSIST_DIR and start the background writer (no-op when disabled)."""
+    if PERSISTENCE is not None:
+        PERSISTENCE.load()
+        PERSISTENCE.start()
+
+
+def stop_persistence() -> None:
+    if PERSISTENCE is not None:
+        PERSISTENCE.stop()
+
+
+def persistence_stats() -> Dict[str, Any]:
+    if PERSISTENCE is None:
+        return {"enabled": False}
+    return {"enabled": True, "directory": PERSISTENCE.directory, **PERSISTENCE.stats}
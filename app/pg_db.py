@@ -1,4 +1,11 @@
+import atexit
+import json
+import logging
 import os
+import queue
+import threading
+import time
+from datetime import date, timedelta
 from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 
@@ -6,20 +13,246 @@ DATABASE_URL = os.getenv("DATABASE_URL", "")
 engine = create_engine(DATABASE_URL, echo=False, pool_pre_ping=True)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
-def insert_scam_message(message: str, scam_type: str, confidence: float, source: str = "user"):
+# -----------------------------
+# Write-behind settings
+# -----------------------------
+PG_WRITE_BEHIND = os.getenv("PG_WRITE_BEHIND", "1") != "0"
+PG_WRITE_BATCH_SIZE = int(os.getenv("PG_WRITE_BATCH_SIZE", "500"))
+PG_WRITE_FLUSH_SECONDS = float(os.getenv("PG_WRITE_FLUSH_SECONDS", "0.5"))
+PG_WRITE_QUEUE_SIZE = int(os.getenv("PG_WRITE_QUEUE_SIZE", "50000"))
+# how long a caller may block on a full queue (backpressure) before queue.Full is raised
+PG_WRITE_ENQUEUE_TIMEOUT = float(os.getenv("PG_WRITE_ENQUEUE_TIMEOUT", "5.0"))
+# batches the writer gives up on are appended here as JSON lines (replay them later)
+PG_DEAD_LETTER_PATH = os.getenv("PG_DEAD_LETTER_PATH", "")
+
+logger = logging.getLogger(__name__)
+
+_INSERT_SQL = text("""
+    INSERT INTO scam_messages (message, scam_type, confidence, source)
+    VALUES (:m, :t, :c, :s)
+""")
+
+_WRITE_QUEUE: queue.Queue = queue.Queue(maxsize=PG_WRITE_QUEUE_SIZE)
+_WRITE_STATS = {"enqueued": 0, "written": 0, "batches": 0, "failed": 0, "dead_lettered": 0}
+_STOP = object()
+_writer: threading.Thread | None = None
+_writer_lock = threading.Lock()
+
+
+# -----------------------------
+# Stats rollups
+# -----------------------------
+# scam_message_rollups keeps per (day, scam_type, source) counts, bumped in the
+# same transaction as the inserts, so fetch_stats never scans scam_messages.
+# "day" is always the database's date (CURRENT_DATE / DATE(detected_at), in the
+# session time zone), so live bumps and rebuild_rollups() bucket rows alike.
+STATS_CACHE_SECONDS = float(os.getenv("STATS_CACHE_SECONDS", "5"))
+
+_ROLLUP_DDL = text("""
+    CREATE TABLE IF NOT EXISTS scam_message_rollups (
+        day DATE NOT NULL,
+        scam_type TEXT NOT NULL,
+        source TEXT NOT NULL,
+        c BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, scam_type, source)
+    )
+""")
+
+_ROLLUP_UPSERT_SQL = text("""
+    INSERT INTO scam_message_rollups (day, scam_type, source, c)
+    VALUES (CURRENT_DATE, :t, :s, :n)
+    ON CONFLICT (day, scam_type, source)
+    DO UPDATE SET c = scam_message_rollups.c + excluded.c
+""")
+
+_ROLLUP_BACKFILL_SQL = text("""
+    INSERT INTO scam_message_rollups (day, scam_type, source, c)
+    SELECT DATE(detected_at), COALESCE(scam_type,'UNKNOWN'), COALESCE(source,'unknown'), COUNT(*)
+    FROM scam_messages
+    GROUP BY DATE(detected_at), COALESCE(scam_type,'UNKNOWN'), COALESCE(source,'unknown')
+""")
+
+_rollups_ready = False
+_rollups_lock = threading.Lock()
+_STATS_CACHE: dict = {}  # days -> (expires_at, stats)
+
+
+def _lock_rollups(db) -> None:
+    # Postgres: other workers' backfills and upserts wait until this transaction
+    # commits, so check-empty-then-backfill cannot run twice or miss rows
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("LOCK TABLE scam_message_rollups IN EXCLUSIVE MODE"))
+
+
+def ensure_rollups() -> None:
+    """Create the rollup table, backfilling it from scam_messages the first time."""
+    global _rollups_ready
+    if _rollups_ready:
+        return
+    with _rollups_lock:
+        if _rollups_ready:
+            return
+        db = SessionLocal()
+        try:
+            db.execute(_ROLLUP_DDL)
+            _lock_rollups(db)
+            empty = db.execute(
+                text("SELECT COUNT(*) AS c FROM scam_message_rollups")
+            ).mappings().first()["c"] == 0
+            if empty:
+                db.execute(_ROLLUP_BACKFILL_SQL)
+            db.commit()
+        finally:
+            db.close()
+        _rollups_ready = True
+
+
+def rebuild_rollups() -> None:
+    """Recompute the rollups from scratch (e.g. after rows were inserted out of band)."""
+    global _rollups_ready
+    with _rollups_lock:
+        db = SessionLocal()
+        try:
+            db.execute(_ROLLUP_DDL)
+            _lock_rollups(db)
+            db.execute(text("DELETE FROM scam_message_rollups"))
+            db.execute(_ROLLUP_BACKFILL_SQL)
+            db.commit()
+        finally:
+            db.close()
+        _rollups_ready = True
+    _STATS_CACHE.clear()
+
+
+def _rollup_deltas(rows: list[dict]) -> list[dict]:
+    counts: dict = {}
+    for r in rows:
+        key = (r["t"] or "UNKNOWN", r["s"] or "unknown")
+        counts[key] = counts.get(key, 0) + 1
+    return [{"t": t, "s": src, "n": n} for (t, src), n in counts.items()]
+
+
+def insert_scam_messages(rows: list[dict]) -> None:
+    """Insert many rows in one transaction (executemany). Rows use keys m, t, c, s."""
+    if not rows:
+        return
+    ensure_rollups()
     db = SessionLocal()
     try:
-        db.execute(
-            text("""
-                INSERT INTO scam_messages (message, scam_type, confidence, source)
-                VALUES (:m, :t, :c, :s)
-            """),
-            {"m": message, "t": scam_type, "c": float(confidence), "s": source}
-        )
+        db.execute(_INSERT_SQL, rows)
+        db.execute(_ROLLUP_UPSERT_SQL, _rollup_deltas(rows))
         db.commit()
     finally:
         db.close()
 
+
+def _dead_letter(batch: list[dict]) -> None:
+    if not PG_DEAD_LETTER_PATH:
+        return
+    try:
+        with open(PG_DEAD_LETTER_PATH, "a", encoding="utf-8") as f:
+            for row in batch:
+                f.write(json.dumps(row) + "\n")
+        _WRITE_STATS["dead_lettered"] += len(batch)
+    except OSError:
+        logger.exception("could not write %d rows to %s", len(batch), PG_DEAD_LETTER_PATH)
+
+
+def _write_batch(batch: list[dict]) -> None:
+    for attempt in range(2):
+        try:
+            insert_scam_messages(batch)
+            _WRITE_STATS["written"] += len(batch)
+            _WRITE_STATS["batches"] += 1
+            return
+        except Exception:
+            if attempt == 0:
+                logger.warning("write-behind insert of %d rows failed; retrying", len(batch), exc_info=True)
+                time.sleep(PG_WRITE_FLUSH_SECONDS)
+            else:
+                logger.error(
+                    "write-behind insert of %d rows failed twice; dropping the batch%s",
+                    len(batch), f" (appended to {PG_DEAD_LETTER_PATH})" if PG_DEAD_LETTER_PATH else "",
+                    exc_info=True,
+                )
+    _WRITE_STATS["failed"] += len(batch)
+    _dead_letter(batch)
+
+
+def _writer_loop() -> None:
+    while True:
+        item = _WRITE_QUEUE.get()
+        if item is _STOP:
+            _WRITE_QUEUE.task_done()
+            return
+
+        batch = [item]
+        stop = False
+        deadline = time.monotonic() + PG_WRITE_FLUSH_SECONDS
+        while len(batch) < PG_WRITE_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = _WRITE_QUEUE.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                stop = True
+                break
+            batch.append(item)
+
+        _write_batch(batch)
+        for _ in range(len(batch) + stop):
+            _WRITE_QUEUE.task_done()
+        if stop:
+            return
+
+
+def _ensure_writer() -> None:
+    global _writer
+    if _writer is not None and _writer.is_alive():
+        return
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_writer_loop, name="pg-write-behind", daemon=True)
+            _writer.start()
+
+
+def insert_scam_message(message: str, scam_type: str, confidence: float, source: str = "user"):
+    row = {"m": message, "t": scam_type, "c": float(confidence), "s": source}
+    if not PG_WRITE_BEHIND:
+        insert_scam_messages([row])
+        return
+
+    # ✅ enqueue and return; blocks (backpressure) only while the queue is full
+    _ensure_writer()
+    _WRITE_QUEUE.put(row, timeout=PG_WRITE_ENQUEUE_TIMEOUT)
+    _WRITE_STATS["enqueued"] += 1
+
+
+def flush_pending_writes() -> None:
+    """Block until every queued row has been written (or counted as failed)."""
+    if _writer is not None and _writer.is_alive():
+        _WRITE_QUEUE.join()
+
+
+def stop_writer(timeout: float = 30.0) -> None:
+    """Flush the queue and stop the background writer."""
+    global _writer
+    if _writer is None or not _writer.is_alive():
+        return
+    _WRITE_QUEUE.put(_STOP)
+    _writer.join(timeout)
+    _writer = None
+
+
+def write_stats() -> dict:
+    return {**_WRITE_STATS, "pending": _WRITE_QUEUE.qsize()}
+
+
+atexit.register(stop_writer)
+
 def fetch_latest_messages(limit: int = 20):
     db = SessionLocal()
     try:
@@ -37,47 +270,59 @@ def fetch_latest_messages(limit: int = 20):
         db.close()
 
 def fetch_stats(days: int = 7):
+    days = int(days)
+    cached = _STATS_CACHE.get(days)
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+
+    ensure_rollups()
     db = SessionLocal()
     try:
         total = db.execute(
-            text("SELECT COUNT(*) AS c FROM scam_messages")
+            text("SELECT COALESCE(SUM(c), 0) AS c FROM scam_message_rollups")
         ).mappings().first()["c"]
 
         by_type = db.execute(
             text("""
-                SELECT COALESCE(scam_type,'UNKNOWN') AS scam_type, COUNT(*) AS c
-                FROM scam_messages
-                GROUP BY COALESCE(scam_type,'UNKNOWN')
+                SELECT scam_type, SUM(c) AS c
+                FROM scam_message_rollups
+                GROUP BY scam_type
                 ORDER BY c DESC
             """)
         ).mappings().all()
 
         by_source = db.execute(
             text("""
-                SELECT COALESCE(source,'unknown') AS source, COUNT(*) AS c
-                FROM scam_messages
-                GROUP BY COALESCE(source,'unknown')
+                SELECT source, SUM(c) AS c
+                FROM scam_message_rollups
+                GROUP BY source
                 ORDER BY c DESC
             """)
         ).mappings().all()
 
-        # last N days time-series
+        # last N days time-series, counted back from the database's own date
+        today = db.execute(text("SELECT CURRENT_DATE")).scalar()
+        since = date.fromisoformat(str(today)) - timedelta(days=days)
         timeseries = db.execute(
             text("""
-                SELECT DATE(detected_at) AS day, COUNT(*) AS c
-                FROM scam_messages
-                WHERE detected_at >= NOW() - (:d || ' days')::interval
-                GROUP BY DATE(detected_at)
+                SELECT day, SUM(c) AS c
+                FROM scam_message_rollups
+                WHERE day >= :since
+                GROUP BY day
                 ORDER BY day ASC
             """),
-            {"d": int(days)}
+            {"since": since}
         ).mappings().all()
 
-        return {
+        stats = {
             "total": int(total),
-            "by_type": [dict(r) for r in by_type],
-            "by_source": [dict(r) for r in by_source],
+            "by_type": [{"scam_type": r["scam_type"], "c": int(r["c"])} for r in by_type],
+            "by_source": [{"source": r["source"], "c": int(r["c"])} for r in by_source],
             "timeseries": [{"day": str(r["day"]), "count": int(r["c"])} for r in timeseries],
         }
     finally:
         db.close()
+
+    if STATS_CACHE_SECONDS > 0:
+        _STATS_CACHE[days] = (time.monotonic() + STATS_CACHE_SECONDS, stats)
+    return stats
@@ -0,0 +1,102 @@
+"""Rule scoring for single messages and batches.
+
+No side effects on import (no app, stores or clients), so offline tools and
+their worker processes (app/bulk_score.py) can score without loading the API.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List
+
+try:
+    import numpy as np
+except ImportError:  # batch scoring falls back to per-message loops
+    np = None
+
+from app.keywords import (
+    find_keywords, has_any,
+    PAY_KEYWORDS, REWARD_KEYWORDS, URGENCY_KEYWORDS, DELIVERY_KEYWORDS,
+    JOB_KEYWORDS, UTILITY_KEYWORDS, GOVT_KEYWORDS, CREDENTIAL_KEYWORDS,
+)
+
+# (keywords, weight, reason, scam_type) — evaluated in order, later types win
+ANALYZE_RULES = [
+    (PAY_KEYWORDS, 0.3, "keyword:pay", "UPI_PAYMENT"),
+    (REWARD_KEYWORDS, 0.3, "pattern:reward_scam", "REWARD_SCAM"),
+    (DELIVERY_KEYWORDS, 0.3, "pattern:delivery_scam", "DELIVERY_SCAM"),
+    (JOB_KEYWORDS, 0.3, "pattern:job_scam", "JOB_SCAM"),
+    (UTILITY_KEYWORDS, 0.3, "pattern:utility_scam", "UTILITY_SCAM"),
+    (GOVT_KEYWORDS, 0.3, "pattern:govt_benefit_scam", "GOVT_BENEFIT_SCAM"),
+    (URGENCY_KEYWORDS, 0.2, "pattern:urgency", None),
+    (CREDENTIAL_KEYWORDS, 0.2, "pattern:credential_theft", "PHISHING"),
+]
+
+if np is not None:
+    _RULE_WEIGHTS = np.array([w for _, w, _, _ in ANALYZE_RULES], dtype=np.float64)
+
+
+def analyze_message(text: str, hits=None) -> Dict[str, Any]:
+    if hits is None:
+        hits = find_keywords(text)
+    reasons = []
+    score = 0.0
+    scam_type = "UNKNOWN"
+
+    for keywords, weight, reason, rule_type in ANALYZE_RULES:
+        if has_any(hits, keywords):
+            score += weight
+            reasons.append(reason)
+            if rule_type:
+                scam_type = rule_type
+
+    return _build_result(score, reasons, scam_type)
+
+
+def _build_result(score: float, reasons: List[str], scam_type: str) -> Dict[str, Any]:
+    # rounded so the batch path (one matrix multiply) and this path agree exactly
+    score = round(min(score, 1.0), 6)
+
+    is_scam = score >= 0.5
+
+    user_alert = None
+    recommended_actions = []
+    if is_scam:
+        user_alert = "⚠️ Suspicious message detected. Do NOT pay or share OTP/UPI PIN."
+        recommended_actions = [
+            "Do not click unknown links.",
+            "Do not approve UPI collect requests.",
+            "Verify through official website/app or customer care.",
+            "Report and block the sender."
+        ]
+
+    return {
+        "is_scam": is_scam,
+        "scam_score": float(score),
+        "scam_type": scam_type,
+        "reasons": reasons,
+        "user_alert": user_alert,
+        "recommended_actions": recommended_actions
+    }
+
+
+def analyze_batch(texts: List[str]) -> List[Dict[str, Any]]:
+    """Score many messages at once: one keyword-hit matrix, one weight multiply."""
+    hit_sets = [find_keywords(t) for t in texts]
+    if np is None or not texts:
+        return [analyze_message(t, h) for t, h in zip(texts, hit_sets)]
+
+    matrix = np.array(
+        [[has_any(h, rule[0]) for rule in ANALYZE_RULES] for h in hit_sets],
+        dtype=np.float64,
+    )
+    scores = matrix @ _RULE_WEIGHTS
+
+    results = []
+    for row, score in zip(matrix, scores):
+        reasons = []
+        scam_type = "UNKNOWN"
+        for j in np.flatnonzero(row):
+            _, _, reason, rule_type = ANALYZE_RULES[j]
+            reasons.append(reason)
+            if rule_type:
+                scam_type = rule_type
+        results.append(_build_result(float(score), reasons, scam_type))
+    return results
@@ -1,13 +1,102 @@
 from __future__ import annotations
-from typing import Dict, Any
+from bisect import bisect_left
+from contextlib import nullcontext
+from typing import Dict, Any, Tuple
+import os
+import threading
 import time
 import hashlib
 
-_SESSIONS: Dict[str, Dict[str, Any]] = {}
+from app.near_dup import MinHashIndex
+from app.persistence import register_namespace
+from app.store import StripedLock, get_store
 
-# ✅ Global memory database (in-memory)
+# ✅ Global memory database (bounded; in-process or shared, see app/store.py)
 # message_hash -> {count, first_seen, last_seen, last_analyze, intel}
-_MEMORY: Dict[str, Dict[str, Any]] = {}
+# intel values are sets; memory_intel() sorts them only when a response needs them.
+# The store keeps records in last-put order (memory_update puts on every call),
+# so both LRU eviction and TTL expiry take from the oldest end.
+_MEMORY = get_store("memory")
+_MEMORY_LOCKS = StripedLock()  # message_hash -> lock for the record's read-modify-write
+
+MEMORY_MAX_ENTRIES = int(os.getenv("MEMORY_MAX_ENTRIES", "100000"))  # 0 = unlimited
+MEMORY_MAX_BYTES = int(os.getenv("MEMORY_MAX_BYTES", "0"))  # 0 = unlimited
+MEMORY_TTL_SECONDS = float(os.getenv("MEMORY_TTL_SECONDS", "0"))  # 0 = never expire
+
+_MEMORY_STATS = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+# rough per-object costs used for the byte budget
+_RECORD_OVERHEAD = 1200
+
+INTEL_KINDS = ("upi_ids", "phone_numbers", "links", "domains")
+_STR_OVERHEAD = 50
+
+# near-duplicate index over memory keys (per process; rebuilt from traffic)
+_NEAR_DUP = MinHashIndex()
+
+# Inverted IOC index: "kind:value" -> {"messages": {message_hash}, "sessions": {session_id}}
+# Kept in step with memory records and with live and archived sessions, so
+# pivots never scan either.
+_IOC_INDEX = get_store("ioc_index")
+_IOC_INDEX_LOCKS = StripedLock()
+
+
+def _ioc_key(kind: str, value: str) -> str:
+    return kind + ":" + value
+
+
+def _intel_pairs(intel_of) -> list:
+    """(kind, value) pairs from a memory record's intel dict or a Session."""
+    if isinstance(intel_of, dict):
+        return [(k, v) for k in INTEL_KINDS for v in intel_of.get(k) or ()]
+    return [(k, v) for k in INTEL_KINDS for v in getattr(intel_of, k)]
+
+
+def _ioc_index_add(pairs, field: str, ref: str) -> None:
+    with _IOC_INDEX.transaction():
+        for kind, value in pairs:
+            key = _ioc_key(kind, value)
+            with _IOC_INDEX_LOCKS(key):
+                entry = _IOC_INDEX.get(key)
+                if entry is None:
+                    entry = {"messages": set(), "sessions": set()}
+                elif ref in entry[field]:
+                    continue
+                entry[field].add(ref)
+                _IOC_INDEX.put(key, entry)
+
+
+def _ioc_index_remove(pairs, field: str, ref: str) -> None:
+    with _IOC_INDEX.transaction():
+        for kind, value in pairs:
+            key = _ioc_key(kind, value)
+            with _IOC_INDEX_LOCKS(key):
+                entry = _IOC_INDEX.get(key)
+                if entry is None or ref not in entry[field]:
+                    continue
+                entry[field].discard(ref)
+                if entry["messages"] or entry["sessions"]:
+                    _IOC_INDEX.put(key, entry)
+                else:
+                    _IOC_INDEX.delete(key)
+
+
+def index_session_intel(session_id: str, intel_log_entries) -> None:
+    """Link newly learned session intel ((msg_index, kind, value) entries) to the session."""
+    _ioc_index_add([(k, v) for _, k, v in intel_log_entries], "sessions", session_id)
+
+
+def ioc_lookup(kind: str, value: str) -> Dict[str, Any] | None:
+    """Message hashes and session IDs that used one IOC; None for an unknown kind."""
+    if kind not in INTEL_KINDS:
+        return None
+    entry = _IOC_INDEX.get(_ioc_key(kind, value)) or {"messages": (), "sessions": ()}
+    return {
+        "kind": kind,
+        "value": value,
+        "messages": sorted(entry["messages"]),
+        "sessions": sorted(entry["sessions"]),
+    }
 
 
 def _normalize_text(text: str) -> str:
@@ -19,118 +108,520 @@ def message_hash(text: str) -> str:
     return hashlib.sha256(norm.encode("utf-8")).hexdigest()
 
 
+def _analyze_size(analyze: dict | None) -> int:
+    if not analyze:
+        return 0
+    return sum(len(r) + _STR_OVERHEAD for r in analyze.get("reasons", []))
+
+
+def _memory_drop(h: str, stale_before: float | None = None) -> bool:
+    """Delete one record with its near-dup entry and IOC back-references, under the
+    record's lock so a concurrent memory_update cannot re-create it halfway.
+    With stale_before, a record seen since then is kept."""
+    with _MEMORY.transaction(), _MEMORY_LOCKS(h):
+        rec = _MEMORY.get(h)
+        if rec is None:
+            # already gone (another worker sharing the store)
+            _NEAR_DUP.remove(h)
+            return False
+        if stale_before is not None and rec["last_seen"] >= stale_before:
+            return False
+        _MEMORY.delete(h)
+        _NEAR_DUP.remove(h)
+        _ioc_index_remove(_intel_pairs(rec["intel"]), "messages", h)
+        return True
+
+
+def _memory_expire(now: float) -> None:
+    if MEMORY_TTL_SECONDS <= 0:
+        return
+    cutoff = now - MEMORY_TTL_SECONDS
+    for h, _ in _MEMORY.items(older_than=cutoff):
+        if _memory_drop(h, stale_before=cutoff):
+            _MEMORY_STATS["expirations"] += 1
+
+
+def _memory_evict() -> None:
+    while (
+        (MEMORY_MAX_ENTRIES > 0 and len(_MEMORY) > MEMORY_MAX_ENTRIES)
+        or (MEMORY_MAX_BYTES > 0 and _MEMORY.total_size() > MEMORY_MAX_BYTES)
+    ):
+        oldest = _MEMORY.oldest()
+        if oldest is None:
+            break
+        if _memory_drop(oldest[0]):
+            _MEMORY_STATS["evictions"] += 1
+
+
 def memory_lookup(text: str) -> dict | None:
     h = message_hash(text)
-    return _MEMORY.get(h)
+    now = time.time()
+    _memory_expire(now)
+
+    rec = _MEMORY.get(h)
+    if rec is None:
+        _MEMORY_STATS["misses"] += 1
+    else:
+        _MEMORY_STATS["hits"] += 1
+    return rec
+
+
+def memory_stats() -> Dict[str, Any]:
+    return {
+        **_MEMORY_STATS,
+        "entries": len(_MEMORY),
+        "near_dup_entries": len(_NEAR_DUP),
+        "ioc_index_entries": len(_IOC_INDEX),
+        "bytes": _MEMORY.total_size(),
+        "max_entries": MEMORY_MAX_ENTRIES,
+        "max_bytes": MEMORY_MAX_BYTES,
+        "ttl_seconds": MEMORY_TTL_SECONDS,
+    }
+
+
+def memory_nearest(text: str) -> Tuple[dict | None, float]:
+    """Closest remembered message (same template, other details) and its estimated similarity."""
+    h = message_hash(text)
+    found = _NEAR_DUP.nearest(h, text)
+    if found is None:
+        return None, 0.0
+    key, sim = found
+    rec = _MEMORY.get(key)
+    if rec is None:
+        # evicted by another worker sharing the store
+        _NEAR_DUP.remove(key)
+        return None, 0.0
+    return rec, sim
 
 
 def memory_update(text: str, analyze_result: dict | None = None, intel: dict | None = None) -> dict:
     h = message_hash(text)
     now = time.time()
 
-    if h not in _MEMORY:
-        _MEMORY[h] = {
+    # one store transaction for the merge and its index/eviction side effects
+    with _MEMORY.transaction():
+        _memory_expire(now)
+        # the record, its near-dup entry and its back-references change together
+        with _MEMORY_LOCKS(h):
+            rec, new_intel = _memory_merge(h, now, analyze_result, intel)
+            _NEAR_DUP.add(h, text)
+            if new_intel:
+                _ioc_index_add(new_intel, "messages", h)
+        _memory_evict()
+
+    return rec
+
+
+def _memory_merge(
+    h: str, now: float, analyze_result: dict | None, intel: dict | None
+) -> Tuple[dict, list]:
+    """Fold one sighting into the record; returns it with the (kind, value) pairs it gained."""
+    rec = _MEMORY.get(h)
+    if rec is None:
+        rec = {
             "count": 0,
             "first_seen": now,
             "last_seen": now,
             "last_analyze": None,
-            "intel": {"upi_ids": [], "phone_numbers": [], "links": [], "domains": []},
+            "intel": {k: set() for k in INTEL_KINDS},
         }
+        size = _RECORD_OVERHEAD
+    else:
+        size = _MEMORY.size_of(h)
 
-    rec = _MEMORY[h]
     rec["count"] += 1
     rec["last_seen"] = now
 
+    grown = 0
+    new_intel = []
     if analyze_result is not None:
-        rec["last_analyze"] = analyze_result
+        grown += _analyze_size(analyze_result) - _analyze_size(rec["last_analyze"])
+        # a copy: callers (main._with_memory) keep adding fields to their result
+        rec["last_analyze"] = dict(analyze_result)
 
     if intel is not None:
-        for k in ["upi_ids", "phone_numbers", "links", "domains"]:
-            existing = set(rec["intel"].get(k, []))
-            incoming = set(intel.get(k, []))
-            rec["intel"][k] = sorted(list(existing | incoming))
-
-    return rec
-
-
-def create_session(session_id: str, analyze_result: dict | None = None) -> Dict[str, Any]:
-    s = {
-        "id": session_id,
-        "status": "RUNNING",
-        "stop_reason": None,
-
-        "turns": 0,
-        "repeat_count": 0,
-        "last_intent": "",
-
-        "nudges": 0,
-        "last_scammer_time": time.time(),
+        for k in INTEL_KINDS:
+            current = rec["intel"][k]
+            for v in intel.get(k) or ():
+                if v not in current:
+                    current.add(v)
+                    new_intel.append((k, v))
+                    grown += len(v) + _STR_OVERHEAD
+
+    _MEMORY.put(h, rec, size=size + grown)
+    return rec, new_intel
+
+
+def memory_intel(rec: dict) -> Dict[str, list]:
+    """Sorted-list view of a memory record's intel, for responses."""
+    return {k: sorted(rec["intel"][k]) for k in INTEL_KINDS}
+
+
+_EMPTY: frozenset = frozenset()
+
+
+class Session:
+    """One honeypot conversation. Slotted, with intel sets allocated on first use."""
+
+    __slots__ = (
+        "id", "status", "stop_reason",
+        "turns", "repeat_count", "last_intent",
+        "nudges", "last_scammer_time",
+        "analyze_result",
+        "refused_site_flag", "no_progress_count",
+        "upi_ids", "phone_numbers", "links", "domains",
+        "messages",  # [(role, text, ts)]
+        "intel_log",  # [(message_index, kind, value)] in discovery order, for deltas
+    )
+
+    def __init__(self, session_id: str, analyze_result: dict | None = None):
+        self.id = session_id
+        self.status = "RUNNING"
+        self.stop_reason = None
+
+        self.turns = 0
+        self.repeat_count = 0
+        self.last_intent = ""
+
+        self.nudges = 0
+        self.last_scammer_time = time.time()
+
+        self.analyze_result = analyze_result
+
+        self.refused_site_flag = False
+        self.no_progress_count = 0
+
+        self.upi_ids = _EMPTY
+        self.phone_numbers = _EMPTY
+        self.links = _EMPTY
+        self.domains = _EMPTY
+
+        self.messages = []
+        self.intel_log = []
+
+    def add_intel(self, extracted: dict) -> bool:
+        """Merge extracted intel; True if anything new was learned."""
+        progress = False
+        for k in INTEL_KINDS:
+            values = extracted.get(k)
+            if not values:
+                continue
+            current = getattr(self, k)
+            if not isinstance(current, set):
+                current = set()
+                setattr(self, k, current)
+            msg_index = len(self.messages) - 1
+            for v in values:
+                if v not in current:
+                    current.add(v)
+                    self.intel_log.append((msg_index, k, v))
+                    progress = True
+        return progress
+
+    def add_message(self, role: str, text: str) -> None:
+        self.messages.append((role, text, time.time()))
+
+    def end(self, reason: str) -> None:
+        self.status = "ENDED"
+        self.stop_reason = reason
+
+
+# session_id -> Session. With a shared backend get_session returns a copy, so
+# callers that mutate a session must save_session() it afterwards.
+_SESSIONS = get_store("sessions")
+
+# One lock per live session: turns on the same session run one at a time,
+# turns on different sessions never wait for each other. Locks exist only for
+# sessions in the store, so unknown IDs cannot grow this dict.
+_SESSION_LOCKS: Dict[str, threading.Lock] = {}
+
+SESSION_IDLE_TTL_SECONDS = float(os.getenv("SESSION_IDLE_TTL_SECONDS", "3600"))
+SESSION_ENDED_TTL_SECONDS = float(os.getenv("SESSION_ENDED_TTL_SECONDS", "300"))
+SESSION_REAP_INTERVAL_SECONDS = float(os.getenv("SESSION_REAP_INTERVAL_SECONDS", "60"))
+
+# Reaped sessions leave a compact record here (intel, counters, analyze_result;
+# no transcript), so /honeypot/session/{id}, the dashboard's intel view and
+# /iocs/lookup session pivots keep working after the conversation itself is
+# dropped. Bounded on its own; a session's IOC postings go when its record does.
+_SESSION_ARCHIVE = get_store("session_archive")
+SESSION_ARCHIVE_MAX_ENTRIES = int(os.getenv("SESSION_ARCHIVE_MAX_ENTRIES", "100000"))  # 0 = unlimited
+SESSION_ARCHIVE_TTL_SECONDS = float(os.getenv("SESSION_ARCHIVE_TTL_SECONDS", str(30 * 86400)))  # 0 = never
+
+_SESSION_STATS = {"reaped_ended": 0, "reaped_idle": 0, "archive_dropped": 0}
+_REAPER_STOP = threading.Event()
+
+
+def session_lock(session_id: str) -> threading.Lock | None:
+    """The session's lock; None (and no lock created) when the session does not exist."""
+    lock = _SESSION_LOCKS.get(session_id)
+    if lock is None and session_id in _SESSIONS:
+        # created by another worker sharing the store
+        lock = _SESSION_LOCKS.setdefault(session_id, threading.Lock())
+    return lock
+
+
+def create_session(session_id: str, analyze_result: dict | None = None) -> Session:
+    s = Session(session_id, analyze_result=analyze_result)
+    _SESSIONS.put(session_id, s)
+    _SESSION_LOCKS.setdefault(session_id, threading.Lock())
+    return s
 
-        "analyze_result": analyze_result,
 
-        "refused_site_flag": False,
-        "no_progress_count": 0,
+def get_session(session_id: str) -> Session | None:
+    return _SESSIONS.get(session_id)
 
-        "intel": {
-            "upi_ids": set(),
-            "phone_numbers": set(),
-            "links": set(),
-            "domains": set(),
-        },
 
-        "messages": []  # {role, text, ts}
-    }
-    _SESSIONS[session_id] = s
-    return s
+def save_session(s: Session) -> None:
+    _SESSIONS.put(s.id, s)
 
 
-def get_session(session_id: str) -> Dict[str, Any] | None:
-    return _SESSIONS.get(session_id)
+def session_transaction():
+    """Store transaction around a session's read-modify-write (see app/store.py)."""
+    return _SESSIONS.transaction()
 
 
 def end_session(session_id: str, reason: str) -> None:
-    s = _SESSIONS.get(session_id)
-    if not s:
+    lock = session_lock(session_id)
+    if lock is None:
         return
-    s["status"] = "ENDED"
-    s["stop_reason"] = reason
+    with lock, _SESSIONS.transaction():
+        s = _SESSIONS.get(session_id)
+        if not s:
+            return
+        s.end(reason)
+        save_session(s)
 
 
 def add_message(session_id: str, role: str, text: str) -> None:
-    s = _SESSIONS.get(session_id)
-    if not s:
+    lock = session_lock(session_id)
+    if lock is None:
         return
-    s["messages"].append({"role": role, "text": text, "ts": time.time()})
+    with lock, _SESSIONS.transaction():
+        s = _SESSIONS.get(session_id)
+        if not s:
+            return
+        s.add_message(role, text)
+        save_session(s)
 
 
 def update_last_scammer_time(session_id: str) -> None:
-    s = _SESSIONS.get(session_id)
-    if not s:
+    lock = session_lock(session_id)
+    if lock is None:
         return
-    s["last_scammer_time"] = time.time()
+    with lock, _SESSIONS.transaction():
+        s = _SESSIONS.get(session_id)
+        if not s:
+            return
+        s.last_scammer_time = time.time()
+        save_session(s)
+
+
+def reap_sessions(now: float | None = None) -> int:
+    """Drop ENDED sessions and idle RUNNING ones once their TTL (from last_scammer_time) passes."""
+    now = time.time() if now is None else now
+    removed = 0
+    # sessions are put on every turn, so anything reapable was last touched before this
+    cutoff = now - min(SESSION_ENDED_TTL_SECONDS, SESSION_IDLE_TTL_SECONDS or SESSION_ENDED_TTL_SECONDS)
+    for session_id, _ in _SESSIONS.items(older_than=cutoff):
+        lock = session_lock(session_id)
+        if lock is None:
+            continue
+        with lock, _SESSIONS.transaction():
+            # re-read under the lock: a turn may have just finished
+            s = _SESSIONS.get(session_id)
+            if s is None:
+                continue
+            idle = now - s.last_scammer_time
+            if s.status == "ENDED" and idle >= SESSION_ENDED_TTL_SECONDS:
+                _SESSION_STATS["reaped_ended"] += 1
+            elif SESSION_IDLE_TTL_SECONDS > 0 and idle >= SESSION_IDLE_TTL_SECONDS:
+                _SESSION_STATS["reaped_idle"] += 1
+            else:
+                continue
+            # its IOC -> session postings stay until the archive drops it
+            _archive_session(s, now)
+            _SESSIONS.delete(session_id)
+            _SESSION_LOCKS.pop(session_id, None)
+        removed += 1
+
+    # sessions another worker reaped from a shared store leave their lock here
+    for session_id in [k for k in list(_SESSION_LOCKS) if k not in _SESSIONS]:
+        _SESSION_LOCKS.pop(session_id, None)
+
+    _trim_session_archive(now)
+    return removed
+
+
+def _archive_session(s: Session, now: float) -> None:
+    _SESSION_ARCHIVE.put(s.id, {
+        "id": s.id,
+        "status": "ENDED",
+        "stop_reason": s.stop_reason or "idle_timeout",
+        "turns": s.turns,
+        "repeat_count": s.repeat_count,
+        "last_intent": s.last_intent,
+        "nudges": s.nudges,
+        "last_scammer_time": s.last_scammer_time,
+        "archived_at": now,
+        "cursor": len(s.messages),
+        "analyze_result": s.analyze_result,
+        "intel_log": list(s.intel_log),
+    })
+
+
+def _drop_archived(session_id: str, rec: dict) -> None:
+    if _SESSION_ARCHIVE.delete(session_id):
+        _SESSION_STATS["archive_dropped"] += 1
+        _ioc_index_remove([(k, v) for _, k, v in rec["intel_log"]], "sessions", session_id)
+
+
+def _trim_session_archive(now: float) -> None:
+    """Drop archived sessions (and their IOC postings) past SESSION_ARCHIVE_TTL_SECONDS,
+    then the oldest over the cap."""
+    if SESSION_ARCHIVE_TTL_SECONDS > 0:
+        for session_id, rec in _SESSION_ARCHIVE.items(older_than=now - SESSION_ARCHIVE_TTL_SECONDS):
+            _drop_archived(session_id, rec)
+    while SESSION_ARCHIVE_MAX_ENTRIES > 0 and len(_SESSION_ARCHIVE) > SESSION_ARCHIVE_MAX_ENTRIES:
+        oldest = _SESSION_ARCHIVE.oldest()
+        if oldest is None:
+            break
+        _drop_archived(*oldest)
+
+
+def _reaper_loop(interval: float) -> None:
+    while not _REAPER_STOP.wait(interval):
+        reap_sessions()
+
+
+def start_session_reaper(interval: float = SESSION_REAP_INTERVAL_SECONDS) -> threading.Thread:
+    _REAPER_STOP.clear()
+    t = threading.Thread(target=_reaper_loop, args=(interval,), name="session-reaper", daemon=True)
+    t.start()
+    return t
+
+
+def stop_session_reaper() -> None:
+    _REAPER_STOP.set()
+
+
+def session_stats() -> Dict[str, Any]:
+    return {**_SESSION_STATS, "active": len(_SESSIONS), "archived": len(_SESSION_ARCHIVE)}
+
+
+# -----------------------------
+# Warm restarts (PERSIST_DIR, see app/persistence.py)
+# -----------------------------
+def _persist(name: str, store, lock_for=None, sized: bool = False) -> None:
+    """Log every put/delete on an in-process store; sized stores also keep their byte accounting."""
+    if sized:
+        def get(key):
+            value = store.get(key)
+            return None if value is None else (value, store.size_of(key))
+
+        def apply(key, value):
+            if value is None:
+                store.delete(key)
+            else:
+                store.put(key, value[0], size=value[1])
+    else:
+        get = store.get
+
+        def apply(key, value):
+            if value is None:
+                store.delete(key)
+            else:
+                store.put(key, value)
+
+    mark = register_namespace(name, get, apply, lambda: [k for k, _ in store.items()], lock_for)
+    if mark is not None:
+        store.on_change = mark
+
+
+def _existing_session_lock(session_id: str):
+    # reaped sessions have no lock left, and must not get a new one here
+    return _SESSION_LOCKS.get(session_id) or nullcontext()
+
+
+_persist("sessions", _SESSIONS, _existing_session_lock)
+_persist("memory", _MEMORY, _MEMORY_LOCKS, sized=True)
+_persist("ioc_index", _IOC_INDEX, _IOC_INDEX_LOCKS)
+_persist("session_archive", _SESSION_ARCHIVE)
 
 
-def serialize_session(session_id: str) -> Dict[str, Any] | None:
+def serialize_session(
+    session_id: str, since: int | None = None, summary: bool = False
+) -> Dict[str, Any] | None:
+    """Session view for responses.
+
+    ``summary`` returns counters only. ``since`` (the ``cursor`` from a previous
+    response) returns only messages and intel added after that point. Reaped
+    sessions are served from the archive: same intel, no transcript.
+    """
     s = _SESSIONS.get(session_id)
     if not s:
-        return None
-
-    intel = s["intel"]
-    return {
-        "id": s["id"],
-        "status": s["status"],
-        "stop_reason": s["stop_reason"],
-        "turns": s["turns"],
-        "repeat_count": s["repeat_count"],
-        "last_intent": s["last_intent"],
-        "nudges": s["nudges"],
-        "last_scammer_time": s["last_scammer_time"],
-        "analyze_result": s["analyze_result"],
-        "intel": {
-            "upi_ids": sorted(list(intel["upi_ids"])),
-            "phone_numbers": sorted(list(intel["phone_numbers"])),
-            "links": sorted(list(intel["links"])),
-            "domains": sorted(list(intel["domains"])),
-        },
-        "messages": s["messages"],
+        archived = _SESSION_ARCHIVE.get(session_id)
+        return _serialize_archived(archived, since, summary) if archived else None
+
+    out = {
+        "id": s.id,
+        "status": s.status,
+        "stop_reason": s.stop_reason,
+        "turns": s.turns,
+        "repeat_count": s.repeat_count,
+        "last_intent": s.last_intent,
+        "nudges": s.nudges,
+        "last_scammer_time": s.last_scammer_time,
+        "cursor": len(s.messages),
     }
+
+    if summary:
+        out["intel_counts"] = {k: len(getattr(s, k)) for k in INTEL_KINDS}
+        return out
+
+    out["analyze_result"] = s.analyze_result
+
+    if since is None:
+        out["intel"] = {k: sorted(getattr(s, k)) for k in INTEL_KINDS}
+        out["messages"] = _message_dicts(s.messages)
+        return out
+
+    since = max(0, since)
+    intel_new: Dict[str, list] = {k: [] for k in INTEL_KINDS}
+    for _, kind, value in s.intel_log[bisect_left(s.intel_log, (since,)):]:
+        intel_new[kind].append(value)
+
+    out["since"] = since
+    out["intel_new"] = intel_new
+    out["messages"] = _message_dicts(s.messages[since:])
+    return out
+
+
+def _serialize_archived(rec: dict, since: int | None, summary: bool) -> Dict[str, Any]:
+    out = {k: rec[k] for k in (
+        "id", "status", "stop_reason", "turns", "repeat_count", "last_intent",
+        "nudges", "last_scammer_time", "cursor",
+    )}
+    out["archived"] = True
+    if summary:
+        out["intel_counts"] = {k: 0 for k in INTEL_KINDS}
+        for _, kind, _ in rec["intel_log"]:
+            out["intel_counts"][kind] += 1
+        return out
+
+    intel: Dict[str, list] = {k: [] for k in INTEL_KINDS}
+    start = 0 if since is None else bisect_left(rec["intel_log"], (max(0, since),))
+    for _, kind, value in rec["intel_log"][start:]:
+        intel[kind].append(value)
+
+    out["analyze_result"] = rec["analyze_result"]
+    out["messages"] = []
+    if since is None:
+        out["intel"] = {k: sorted(v) for k, v in intel.items()}
+    else:
+        out["since"] = max(0, since)
+        out["intel_new"] = intel
+    return out
+
+
+def _message_dicts(messages: list) -> list:
+    return [{"role": role, "text": text, "ts": ts} for role, text, ts in messages]
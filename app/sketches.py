@@ -0,0 +1,88 @@
+from __future__ import annotations
+from array import array
+from math import log
+import hashlib
+import threading
+
+# -----------------------------
+# Fixed-memory counting sketches
+# -----------------------------
+# Used by app/memory.py when IOC_APPROX=1: frequencies and distinct counts in
+# bounded memory, at the price of small, one-sided (over-)estimation errors.
+
+_MASK64 = (1 << 64) - 1
+
+
+def hash64(s: str) -> int:
+    """Stable 64-bit hash (same value in every worker and across restarts)."""
+    return int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class CountMinSketch:
+    """depth x width counters; estimate() never undercounts.
+
+    Uses conservative update (only the smallest counters are raised), which
+    keeps the overcount from colliding keys much lower than plain increments.
+    """
+
+    def __init__(self, width: int = 1 << 18, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self._table = array("I", bytes(4 * width * depth))
+        self._lock = threading.Lock()
+
+    def _cells(self, h: int) -> list:
+        # Kirsch-Mitzenmacher: depth indexes from two halves of one 64-bit hash
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        w = self.width
+        return [row * w + (h1 + row * h2) % w for row in range(self.depth)]
+
+    def add(self, h: int, n: int = 1) -> int:
+        """Count ``n`` more sightings of hashed key ``h``; returns its new estimate."""
+        cells = self._cells(h)
+        table = self._table
+        with self._lock:
+            target = min(table[c] for c in cells) + n
+            for c in cells:
+                if table[c] < target:
+                    table[c] = target
+        return target
+
+    def estimate(self, h: int) -> int:
+        table = self._table
+        return min(table[c] for c in self._cells(h))
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._table) * self._table.itemsize
+
+
+class HyperLogLog:
+    """Distinct-count estimate in 2**p one-byte registers (~1.04/sqrt(2**p) relative error)."""
+
+    def __init__(self, p: int = 12):
+        self.p = p
+        self.m = 1 << p
+        self._registers = bytearray(self.m)
+        self._alpha = 0.7213 / (1 + 1.079 / self.m)
+
+    def add(self, h: int) -> None:
+        idx = h >> (64 - self.p)
+        rest = (h << self.p) & _MASK64
+        rank = min(64 - rest.bit_length() + 1, 64 - self.p + 1)
+        if rank > self._registers[idx]:
+            self._registers[idx] = rank
+
+    def count(self) -> int:
+        m = self.m
+        regs = self._registers
+        estimate = self._alpha * m * m / sum(2.0 ** -r for r in regs)
+        zeros = regs.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # small-range correction: linear counting
+            estimate = m * log(m / zeros)
+        return int(round(estimate))
+
+    @property
+    def nbytes(self) -> int:
+        return self.m
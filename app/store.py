@@ -0,0 +1,323 @@
+from __future__ import annotations
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+# -----------------------------
+# Shared-state backends
+# -----------------------------
+# STATE_BACKEND=memory (default): plain per-process dicts, fastest, one worker only.
+# STATE_BACKEND=sqlite: one SQLite file in WAL mode shared by every worker on the
+#   node, so `uvicorn --workers N` sees the same sessions, memory and IOCs.
+#
+# Read-modify-write callers wrap get() ... put() in store.transaction(): a no-op
+# in-process (their per-key thread locks suffice), BEGIN IMMEDIATE on SQLite so
+# the update is atomic across processes. Open the transaction *before* taking
+# any in-process lock, so every thread acquires the two in the same order.
+STATE_BACKEND = os.getenv("STATE_BACKEND", "memory").lower()
+STATE_SQLITE_PATH = os.getenv("STATE_SQLITE_PATH", "honeypot_state.db")
+LOCK_STRIPES = int(os.getenv("LOCK_STRIPES", "64"))
+
+
+class StripedLock:
+    """N locks shared out by key hash: same key -> same lock, different keys rarely collide."""
+
+    def __init__(self, stripes: int = LOCK_STRIPES):
+        self._locks = [threading.Lock() for _ in range(max(1, stripes))]
+
+    def __call__(self, key: Any) -> threading.Lock:
+        return self._locks[hash(key) % len(self._locks)]
+
+
+class InProcessStore:
+    """Key/value store in touch order (oldest first); put() touches, get() does not.
+
+    Each call is atomic (a short internal lock guards the ordering); callers
+    that read-modify-write a value hold their own per-key lock around it.
+    """
+
+    def __init__(self):
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._meta: Dict[str, Tuple[float, int]] = {}  # key -> (touched, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.on_change = None  # key -> None, called after every put/delete (see app/persistence.py)
+
+    def transaction(self):
+        return nullcontext()
+
+    def get(self, key: str) -> Any:
+        return self._data.get(key)
+
+    def put(self, key: str, value: Any, size: int = 0) -> None:
+        with self._lock:
+            old = self._meta.get(key)
+            self._bytes += size - (old[1] if old else 0)
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._meta[key] = (time.time(), size)
+        if self.on_change is not None:
+            self.on_change(key)
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            if self._data.pop(key, None) is None:
+                return False
+            self._bytes -= self._meta.pop(key)[1]
+        if self.on_change is not None:
+            self.on_change(key)
+        return True
+
+    def size_of(self, key: str) -> int:
+        meta = self._meta.get(key)
+        return meta[1] if meta else 0
+
+    def total_size(self) -> int:
+        return self._bytes
+
+    def oldest(self) -> Optional[Tuple[str, Any]]:
+        with self._lock:
+            for key, value in self._data.items():
+                return key, value
+        return None
+
+    def items(self, older_than: float | None = None) -> List[Tuple[str, Any]]:
+        with self._lock:
+            if older_than is None:
+                return list(self._data.items())
+            out = []
+            for key, value in self._data.items():
+                if self._meta[key][0] >= older_than:
+                    break
+                out.append((key, value))
+            return out
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=30.0, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+# one connection per (thread, database file), shared by every store on that
+# file, so a transaction covers sessions, memory and the IOC index together
+_LOCAL = threading.local()
+
+
+def _thread_conn(path: str) -> sqlite3.Connection:
+    conns = getattr(_LOCAL, "conns", None)
+    if conns is None:
+        conns = _LOCAL.conns = {}
+    conn = conns.get(path)
+    if conn is None:
+        conn = conns[path] = _connect(path)
+    return conn
+
+
+class _SQLiteBase:
+    def __init__(self, path: str):
+        self._path = path
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        return _thread_conn(self._path)
+
+    @contextmanager
+    def transaction(self):
+        """Hold the database write lock until the block ends; nested blocks join the outer one."""
+        conn = self._conn
+        if conn.in_transaction:
+            yield
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+class SQLiteStore(_SQLiteBase):
+    """Same interface as InProcessStore, values pickled into a WAL-mode SQLite table."""
+
+    def __init__(self, path: str, namespace: str):
+        super().__init__(path)
+        self._table = f"kv_{namespace}"
+        self._namespace = namespace
+        t = self._table
+        self._conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS {t} (
+                k TEXT PRIMARY KEY, v BLOB NOT NULL,
+                size INTEGER NOT NULL DEFAULT 0, touched REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS {t}_touched ON {t} (touched);
+            CREATE TABLE IF NOT EXISTS kv_meta (
+                ns TEXT PRIMARY KEY, n INTEGER NOT NULL, bytes INTEGER NOT NULL
+            );
+            INSERT OR IGNORE INTO kv_meta (ns, n, bytes) VALUES ('{namespace}', 0, 0);
+            CREATE TRIGGER IF NOT EXISTS {t}_ins AFTER INSERT ON {t} BEGIN
+                UPDATE kv_meta SET n = n + 1, bytes = bytes + new.size WHERE ns = '{namespace}';
+            END;
+            CREATE TRIGGER IF NOT EXISTS {t}_del AFTER DELETE ON {t} BEGIN
+                UPDATE kv_meta SET n = n - 1, bytes = bytes - old.size WHERE ns = '{namespace}';
+            END;
+            CREATE TRIGGER IF NOT EXISTS {t}_upd AFTER UPDATE OF size ON {t} BEGIN
+                UPDATE kv_meta SET bytes = bytes + new.size - old.size WHERE ns = '{namespace}';
+            END;
+        """)
+
+    def get(self, key: str) -> Any:
+        row = self._conn.execute(f"SELECT v FROM {self._table} WHERE k = ?", (key,)).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def put(self, key: str, value: Any, size: int = 0) -> None:
+        self._conn.execute(
+            f"""INSERT INTO {self._table} (k, v, size, touched) VALUES (?, ?, ?, ?)
+                ON CONFLICT (k) DO UPDATE SET v = excluded.v, size = excluded.size,
+                touched = excluded.touched""",
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), size, time.time()),
+        )
+
+    def delete(self, key: str) -> bool:
+        return self._conn.execute(f"DELETE FROM {self._table} WHERE k = ?", (key,)).rowcount > 0
+
+    def size_of(self, key: str) -> int:
+        row = self._conn.execute(f"SELECT size FROM {self._table} WHERE k = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def _meta(self) -> Tuple[int, int]:
+        return self._conn.execute(
+            "SELECT n, bytes FROM kv_meta WHERE ns = ?", (self._namespace,)
+        ).fetchone()
+
+    def total_size(self) -> int:
+        return self._meta()[1]
+
+    def oldest(self) -> Optional[Tuple[str, Any]]:
+        row = self._conn.execute(
+            f"SELECT k, v FROM {self._table} ORDER BY touched LIMIT 1"
+        ).fetchone()
+        return (row[0], pickle.loads(row[1])) if row else None
+
+    def items(self, older_than: float | None = None) -> List[Tuple[str, Any]]:
+        if older_than is None:
+            rows = self._conn.execute(f"SELECT k, v FROM {self._table} ORDER BY touched")
+        else:
+            rows = self._conn.execute(
+                f"SELECT k, v FROM {self._table} WHERE touched < ? ORDER BY touched",
+                (older_than,),
+            )
+        return [(k, pickle.loads(v)) for k, v in rows]
+
+    def __contains__(self, key: str) -> bool:
+        return self._conn.execute(
+            f"SELECT 1 FROM {self._table} WHERE k = ?", (key,)
+        ).fetchone() is not None
+
+    def __len__(self) -> int:
+        return self._meta()[0]
+
+
+class SQLiteIocStore(_SQLiteBase):
+    """IOC counters with atomic upserts; top-K is served by the count index."""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS iocs (
+                type TEXT NOT NULL, value TEXT NOT NULL,
+                count INTEGER NOT NULL, first_seen TEXT NOT NULL, last_seen TEXT NOT NULL,
+                PRIMARY KEY (type, value)
+            );
+            CREATE INDEX IF NOT EXISTS iocs_count ON iocs (count);
+            CREATE INDEX IF NOT EXISTS iocs_type_count ON iocs (type, count);
+        """)
+
+    def add(self, ioc_type: str, values: Iterable[str], now: str) -> None:
+        self._conn.executemany(
+            """INSERT INTO iocs (type, value, count, first_seen, last_seen) VALUES (?, ?, 1, ?, ?)
+               ON CONFLICT (type, value) DO UPDATE SET count = count + 1,
+               last_seen = excluded.last_seen""",
+            [(ioc_type, v, now, now) for v in values],
+        )
+
+    def contains(self, ioc_type: str, value: str) -> bool:
+        return self._conn.execute(
+            "SELECT 1 FROM iocs WHERE type = ? AND value = ?", (ioc_type, value)
+        ).fetchone() is not None
+
+    def top(self, limit: int, ioc_type: str | None = None) -> List[Dict[str, Any]]:
+        if ioc_type is None:
+            rows = self._conn.execute(
+                """SELECT type, value, count, first_seen, last_seen FROM iocs
+                   ORDER BY count DESC LIMIT ?""",
+                (int(limit),),
+            )
+        else:
+            rows = self._conn.execute(
+                """SELECT type, value, count, first_seen, last_seen FROM iocs
+                   WHERE type = ? ORDER BY count DESC LIMIT ?""",
+                (ioc_type, int(limit)),
+            )
+        return self._rows(rows)
+
+    def seen_since(self, since: str, ioc_type: str | None = None) -> List[Dict[str, Any]]:
+        # timestamps are "YYYY-MM-DD HH:MM:SS" strings, so text order is time order
+        sql = "SELECT type, value, count, first_seen, last_seen FROM iocs WHERE last_seen >= ?"
+        params: tuple = (since,)
+        if ioc_type is not None:
+            sql += " AND type = ?"
+            params += (ioc_type,)
+        return self._rows(self._conn.execute(sql + " ORDER BY count DESC", params))
+
+    @staticmethod
+    def _rows(rows) -> List[Dict[str, Any]]:
+        return [
+            {"type": t[:-1], "value": v, "count": c, "first_seen": f, "last_seen": ls}
+            for t, v, c, f, ls in rows
+        ]
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM iocs").fetchone()[0]
+
+
+_STORES: Dict[str, Any] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_store(namespace: str):
+    """The configured store for one namespace (``sessions``, ``memory``, ...)."""
+    with _STORES_LOCK:
+        store = _STORES.get(namespace)
+        if store is None:
+            if STATE_BACKEND == "sqlite":
+                store = SQLiteStore(STATE_SQLITE_PATH, namespace)
+            else:
+                store = InProcessStore()
+            _STORES[namespace] = store
+        return store
+
+
+def shared_ioc_store() -> SQLiteIocStore | None:
+    """The shared IOC table, or None when IOC counters stay in-process."""
+    if STATE_BACKEND != "sqlite":
+        return None
+    with _STORES_LOCK:
+        store = _STORES.get("iocs")
+        if store is None:
+            store = SQLiteIocStore(STATE_SQLITE_PATH)
+            _STORES["iocs"] = store
+        return store
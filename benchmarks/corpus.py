@@ -0,0 +1,106 @@
+"""Synthetic scam / legit message corpus for the benchmarks.
+
+Seeded, so every run (and every machine) benchmarks the same messages.
+"""
+from __future__ import annotations
+import random
+from typing import List
+
+SCAM_TEMPLATES = [
+    "Dear {name}, your {bank} KYC is pending and your account will be blocked today. "
+    "Verify immediately at {link} or call {phone}.",
+    "Your reward points worth Rs {amount} are expiring today. Pay Rs 99 processing fee "
+    "to {upi} now to redeem.",
+    "Courier: your parcel is on hold. Pay Rs {amount} delivery charge at {link} "
+    "to reschedule. Tracking {ref}.",
+    "Work from home job! Earn Rs {amount} per day. Registration fee Rs 499, "
+    "send to {upi} and WhatsApp HR on {phone}.",
+    "Electricity bill of Rs {amount} unpaid. Power will be disconnected tonight. "
+    "Pay now to {upi} or call {phone}.",
+    "Congratulations {name}! You are the lottery winner of Rs {amount}. Claim your prize "
+    "at {link} within 24 hours.",
+    "Government subsidy scheme: benefit of Rs {amount} approved. Share OTP and UPI PIN "
+    "to activate. Collect request sent from {upi}.",
+    "Tech support here. Install AnyDesk for remote access so we can fix your {bank} app, "
+    "or visit {link}.",
+]
+
+LEGIT_TEMPLATES = [
+    "Hi {name}, are we still meeting for lunch on Friday?",
+    "Your order #{ref} has been shipped and will arrive on Tuesday.",
+    "Reminder: team standup moved to 10:30 tomorrow.",
+    "Thanks for the photos from the trip, {name}! They came out great.",
+    "Your monthly statement is available in the app. No action needed.",
+    "Can you send me the notes from yesterday's class?",
+]
+
+SCAMMER_TURNS = [
+    "Sir your account is blocked, pay now to reactivate.",
+    "Just pay the fee, it is urgent.",
+    "Send money to {upi} immediately.",
+    "No website, just pay.",
+    "Call me on {phone} if app is failing.",
+    "Click {link} and enter OTP.",
+    "Stop asking questions and pay.",
+    "Collect request sent, approve it now.",
+]
+
+FILLER = [
+    "Please note this is an automated message.",
+    "Ignore if already done.",
+    "Our team is available all day to help you with the process.",
+    "Kindly do the needful at the earliest to avoid inconvenience.",
+    "This message is confidential and meant only for the recipient.",
+]
+
+NAMES = ["Ramesh", "Priya", "Suresh", "Anita", "Vikram", "Meera", "Arjun", "Kavya"]
+BANKS = ["SBI", "HDFC", "ICICI", "Axis", "Kotak"]
+HANDLES = ["okaxis", "ybl", "paytm", "okhdfcbank", "ibl"]
+TLDS = ["com", "in", "xyz", "top", "info"]
+
+# target word counts per length bucket
+LENGTHS = {"short": 15, "medium": 60, "long": 250}
+
+
+def _fill(rng: random.Random, template: str) -> str:
+    return template.format(
+        name=rng.choice(NAMES),
+        bank=rng.choice(BANKS),
+        amount=rng.randrange(99, 99999),
+        ref=rng.randrange(10**7, 10**8),
+        upi=f"{rng.choice(NAMES).lower()}{rng.randrange(1000)}@{rng.choice(HANDLES)}",
+        phone=f"{rng.choice('6789')}{rng.randrange(10**8, 10**9)}",
+        link=f"https://{rng.choice(BANKS).lower()}-verify{rng.randrange(100)}.{rng.choice(TLDS)}/login",
+    )
+
+
+def _pad(rng: random.Random, text: str, words: int) -> str:
+    parts = [text]
+    n = len(text.split())
+    while n < words:
+        extra = rng.choice(FILLER)
+        parts.append(extra)
+        n += len(extra.split())
+    return " ".join(parts)
+
+
+def make_corpus(n: int, length: str = "short", scam_ratio: float = 0.5, seed: int = 42) -> List[str]:
+    """``n`` messages of roughly LENGTHS[length] words, ``scam_ratio`` of them scams."""
+    rng = random.Random(seed)
+    words = LENGTHS[length]
+    out = []
+    for _ in range(n):
+        templates = SCAM_TEMPLATES if rng.random() < scam_ratio else LEGIT_TEMPLATES
+        out.append(_pad(rng, _fill(rng, rng.choice(templates)), words))
+    return out
+
+
+def make_conversations(n: int, seed: int = 42) -> List[List[str]]:
+    """``n`` scammer scripts: an opening scam message followed by scripted follow-ups."""
+    rng = random.Random(seed)
+    convos = []
+    for _ in range(n):
+        turns = [_fill(rng, rng.choice(SCAM_TEMPLATES))]
+        turns += [_fill(rng, rng.choice(SCAMMER_TURNS)) for _ in range(9)]
+        convos.append(turns)
+    return convos
@@ -0,0 +1,157 @@
+"""In-process load test: drives app.main:app through httpx's ASGI transport (no network).
+
+    python -m benchmarks.loadtest                        # steps of 50, 200, 1000 concurrent scammers
+    python -m benchmarks.loadtest --steps 100,500 --turns 8 --analyze-per-turn 2 --out load.json
+
+Each step launches N concurrent scammers. Each one runs /honeypot/start and then
+/honeypot/incoming until the session ends or the turns run out, with /analyze calls
+mixed in. Sessions are kept between steps, so later steps run on a larger store.
+The report covers, per step, throughput, p50/p99 per endpoint, errors, active
+sessions and peak RSS.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import random
+import resource
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.corpus import make_conversations, make_corpus
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _percentile(sorted_ms: List[float], q: float) -> float:
+    if not sorted_ms:
+        return 0.0
+    return round(sorted_ms[min(len(sorted_ms) - 1, int(len(sorted_ms) * q))], 3)
+
+
+class _Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kw):
+        start = time.perf_counter()
+        try:
+            resp = await client.request(method, url, **kw)
+            ok = resp.status_code < 400
+            body = resp.json() if ok else None
+        except Exception:
+            ok, body = False, None
+        self.latencies[endpoint].append((time.perf_counter() - start) * 1000)
+        if not ok:
+            self.errors[endpoint] += 1
+        return body
+
+    def summary(self) -> Dict[str, dict]:
+        out = {}
+        for endpoint, ms in sorted(self.latencies.items()):
+            ms.sort()
+            out[endpoint] = {
+                "n": len(ms),
+                "errors": self.errors.get(endpoint, 0),
+                "p50_ms": _percentile(ms, 0.50),
+                "p99_ms": _percentile(ms, 0.99),
+                "max_ms": round(ms[-1], 3),
+            }
+        return out
+
+
+async def _scammer(client, rec: _Recorder, turns: List[str], analyze: List[str], per_turn: int, rng):
+    body = await rec.call(client, "POST /honeypot/start", "POST", "/honeypot/start",
+                          json={"message": turns[0]})
+    if not body:
+        return
+    sid = body["session_id"]
+    cursor = body["session"]["cursor"] if body.get("session") else 0
+    status = body.get("status")
+
+    for msg in turns[1:]:
+        for _ in range(per_turn):
+            await rec.call(client, "POST /analyze", "POST", "/analyze",
+                           json={"message": rng.choice(analyze)})
+        if status == "ENDED":
+            break
+        body = await rec.call(client, "POST /honeypot/incoming", "POST", "/honeypot/incoming",
+                              json={"session_id": sid, "message": msg, "since": cursor})
+        if not body:
+            break
+        status = body.get("status")
+        cursor = body["session"]["cursor"]
+
+
+async def run_step(client, scammers: int, turns: int, per_turn: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    convos = make_conversations(scammers, seed=seed)
+    analyze = make_corpus(500, length="medium", seed=seed)
+    rec = _Recorder()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        _scammer(client, rec, c[: turns + 1], analyze, per_turn, rng) for c in convos
+    ])
+    elapsed = time.perf_counter() - start
+
+    stats = (await client.get("/sessions/stats")).json()
+    requests = sum(len(v) for v in rec.latencies.values())
+    return {
+        "scammers": scammers,
+        "requests": requests,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1),
+        "endpoints": rec.summary(),
+        "sessions_active": stats["active"],
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+async def main_async(args) -> dict:
+    from app.main import app
+
+    steps = [int(s) for s in args.steps.split(",")]
+    transport = httpx.ASGITransport(app=app)
+    report = {"config": vars(args), "steps": []}
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+        for i, n in enumerate(steps):
+            step = await run_step(client, n, args.turns, args.analyze_per_turn, seed=args.seed + i)
+            report["steps"].append(step)
+            print(
+                f"scammers={n:>6} rps={step['throughput_rps']:>8} "
+                f"sessions={step['sessions_active']:>7} rss={step['peak_rss_mb']}MB",
+                file=sys.stderr,
+            )
+    return report
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", default="50,200,1000", help="concurrent scammers per step")
+    parser.add_argument("--turns", type=int, default=6, help="max /honeypot/incoming turns per scammer")
+    parser.add_argument("--analyze-per-turn", type=int, default=1, help="/analyze calls mixed into each turn")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", help="also write the report JSON here")
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(main_async(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+"""Hot-path benchmarks.
+
+    python -m benchmarks.run                     # run, compare with benchmarks/baseline.json
+    python -m benchmarks.run --quick             # smaller corpus, no 100k store
+    python -m benchmarks.run --out results.json  # also write the results
+    python -m benchmarks.run --update-baseline   # make this run the new baseline
+
+Prints JSON results. Cases slower than the baseline by more than --tolerance
+(ops/sec) are listed under "regressions" and the exit status is 1.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.corpus import LENGTHS, make_conversations, make_corpus
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+
+def _summary(times_ns: List[int]) -> Dict[str, float]:
+    times_ns = sorted(times_ns)
+    n = len(times_ns)
+    total = sum(times_ns) or 1
+    return {
+        "n": n,
+        "ops_per_sec": round(n / (total / 1e9), 1),
+        "mean_us": round(total / n / 1e3, 2),
+        "p50_us": round(times_ns[n // 2] / 1e3, 2),
+        "p99_us": round(times_ns[min(n - 1, int(n * 0.99))] / 1e3, 2),
+    }
+
+
+def _time_calls(fn: Callable, items: list, warmup: int = 50) -> Dict[str, float]:
+    for x in items[:warmup]:
+        fn(x)
+    pc = time.perf_counter_ns
+    times = []
+    for x in items:
+        t0 = pc()
+        fn(x)
+        times.append(pc() - t0)
+    return _summary(times)
+
+
+def _fresh_memory() -> None:
+    """Empty message memory (and its indexes) so each store-size case starts clean."""
+    from app import sessions
+    from app.near_dup import MinHashIndex
+    from app.store import InProcessStore
+
+    sessions._MEMORY = InProcessStore()
+    sessions._NEAR_DUP = MinHashIndex()
+    sessions._IOC_INDEX = InProcessStore()
+
+
+def bench_rules(n: int) -> Dict[str, dict]:
+    from app.classifier import classify_scam_type
+    from app.detector import detect_scam
+    from app.extractor import extract_intel
+    from app.main import analyze_message
+
+    out = {}
+    for length in LENGTHS:
+        corpus = make_corpus(n, length=length, seed=1)
+        out[f"analyze_message[{length}]"] = _time_calls(analyze_message, corpus)
+        out[f"detect_scam[{length}]"] = _time_calls(detect_scam, corpus)
+        out[f"classify_scam_type[{length}]"] = _time_calls(classify_scam_type, corpus)
+        out[f"extract_intel[{length}]"] = _time_calls(extract_intel, corpus)
+    return out
+
+
+def bench_memory(n: int, store_sizes: List[int]) -> Dict[str, dict]:
+    from app.extractor import extract_intel
+    from app.sessions import memory_update
+
+    out = {}
+    corpus = make_corpus(n, length="short", seed=2)
+    intel = {t: extract_intel(t) for t in corpus}
+    for size in store_sizes:
+        _fresh_memory()
+        for t in make_corpus(size, length="short", seed=3):
+            memory_update(t)
+        out[f"memory_update[store={size}]"] = _time_calls(
+            lambda t: memory_update(t, intel=intel[t]), corpus
+        )
+    _fresh_memory()
+    return out
+
+
+def bench_honeypot(n: int) -> Dict[str, dict]:
+    from app.honeypot import handle_incoming_scammer_message
+    from app.sessions import create_session
+
+    convos = make_conversations(n, seed=4)
+    turns = 0
+
+    def run(i: int) -> None:
+        nonlocal turns
+        sid = f"bench-{i}"
+        create_session(sid)
+        for msg in convos[i]:
+            turns += 1
+            if handle_incoming_scammer_message(sid, msg).get("status") == "ENDED":
+                break
+
+    result = _time_calls(run, list(range(n)), warmup=0)
+    result["turns_per_conversation"] = round(turns / n, 2)
+    return {"honeypot_conversation": result}
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[dict]:
+    regressions = []
+    for name, cur in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        ratio = cur["ops_per_sec"] / base["ops_per_sec"]
+        cur["vs_baseline"] = round(ratio, 3)
+        if ratio < 1 - tolerance:
+            regressions.append({
+                "case": name,
+                "ops_per_sec": cur["ops_per_sec"],
+                "baseline_ops_per_sec": base["ops_per_sec"],
+                "ratio": round(ratio, 3),
+            })
+    return regressions
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="smaller corpus, stores up to 10k")
+    parser.add_argument("--out", help="also write results JSON here")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed ops/sec drop (0.25 = 25%%)")
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args(argv)
+
+    n = 500 if args.quick else 2000
+    store_sizes = [0, 10_000] if args.quick else [0, 10_000, 100_000]
+
+    results: Dict[str, dict] = {}
+    results.update(bench_rules(n))
+    results.update(bench_memory(n, store_sizes))
+    results.update(bench_honeypot(n // 5))
+
+    report = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "quick": args.quick,
+            "corpus_size": n,
+            "timestamp": int(time.time()),
+        },
+        "results": results,
+        "regressions": [],
+    }
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump({"meta": report["meta"], "results": results}, f, indent=2, sort_keys=True)
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            report["regressions"] = compare(results, json.load(f)["results"], args.tolerance)
+
+    text = json.dumps(report, indent=2, sort_keys=True)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    return 1 if report["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+"""Default vs FAST_JSON encoding/parsing.
+
+    python -m benchmarks.serialization [--out serialization.json]
+
+Measures three things:
+- Response encoding of real serialize_session payloads (10 to 1000 messages): jsonable_encoder + JSONResponse versus FastJSONResponse.
+- Request parsing for the hot request models: json.loads + model_validate versus model_validate_json.
+- End-to-end GET /honeypot/session latency in two child processes, one with FAST_JSON=0 and one with FAST_JSON=1.
+
+FastJSONResponse needs orjson.
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+
+def _per_call_us(fn: Callable, min_seconds: float = 0.3) -> float:
+    fn()
+    n, elapsed = 0, 0.0
+    start = time.perf_counter()
+    while elapsed < min_seconds:
+        fn()
+        n += 1
+        elapsed = time.perf_counter() - start
+    return round(elapsed / n * 1e6, 2)
+
+
+def _session_with(messages: int) -> str:
+    from app.sessions import add_message, create_session
+
+    sid = f"ser-{messages}"
+    create_session(sid, analyze_result={"scam_score": 0.9, "reasons": ["keyword:pay"]})
+    for i in range(messages):
+        role = "scammer" if i % 2 == 0 else "honeypot"
+        add_message(sid, role, f"Pay Rs {i} now to fraud{i}@ybl or call 98765{i:05d}, urgent!")
+    return sid
+
+
+def bench_encoding() -> Dict[str, dict]:
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    from app.fastjson import FastJSONResponse, orjson
+    from app.sessions import serialize_session
+
+    out = {}
+    for n in (10, 100, 1000):
+        payload = {"reply": "ok", "status": "RUNNING", "session": serialize_session(_session_with(n))}
+        row = {"default_us": _per_call_us(lambda: JSONResponse(jsonable_encoder(payload)))}
+        if orjson is not None:
+            row["fast_us"] = _per_call_us(lambda: FastJSONResponse(payload))
+            row["speedup"] = round(row["default_us"] / row["fast_us"], 1)
+        out[f"session_response[messages={n}]"] = row
+    return out
+
+
+def bench_parsing() -> Dict[str, dict]:
+    from app.main import AnalyzeIn, HoneypotIncomingIn
+
+    bodies = {
+        "AnalyzeIn": (AnalyzeIn, json.dumps({"message": "Your KYC is pending, pay now " * 4}).encode()),
+        "HoneypotIncomingIn": (HoneypotIncomingIn, json.dumps({
+            "session_id": "6f1c2a8e-0000-4000-8000-000000000000",
+            "message": "Send money to fraud@ybl immediately", "since": 12,
+        }).encode()),
+    }
+    out = {}
+    for name, (model, body) in bodies.items():
+        default_us = _per_call_us(lambda: model.model_validate(json.loads(body)))
+        fast_us = _per_call_us(lambda: model.model_validate_json(body))
+        out[f"request_parse[{name}]"] = {
+            "default_us": default_us, "fast_us": fast_us, "speedup": round(default_us / fast_us, 1),
+        }
+    return out
+
+
+async def _e2e(messages: int, requests: int) -> dict:
+    import httpx
+
+    from app.main import app
+
+    sid = _session_with(messages)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(20):
+            await client.get(f"/honeypot/session/{sid}")
+        times = []
+        for _ in range(requests):
+            t0 = time.perf_counter()
+            await client.get(f"/honeypot/session/{sid}")
+            times.append((time.perf_counter() - t0) * 1e6)
+    times.sort()
+    return {"p50_us": round(times[len(times) // 2], 1), "mean_us": round(sum(times) / len(times), 1)}
+
+
+def bench_e2e(messages: int = 500, requests: int = 300) -> Dict[str, dict]:
+    out = {}
+    for flag in ("0", "1"):
+        env = {**os.environ, "FAST_JSON": flag, "METRICS_ENABLED": "0"}
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.serialization", "--e2e-child", str(messages), str(requests)],
+            env=env, capture_output=True, text=True, check=True,
+        )
+        out[f"get_session[messages={messages},FAST_JSON={flag}]"] = json.loads(proc.stdout)
+    return out
+
+
+def main(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out")
+    parser.add_argument("--e2e-child", nargs=2, type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.e2e_child:
+        print(json.dumps(asyncio.run(_e2e(*args.e2e_child))))
+        return 0
+
+    results: Dict[str, dict] = {}
+    results.update(bench_encoding())
+    results.update(bench_parsing())
+    results.update(bench_e2e())
+
+    text = json.dumps({"results": results}, indent=2)
+    print(text)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# app.pg_db builds its engine at import; tests point it at SQLite files of their own
+os.environ.setdefault("DATABASE_URL", "sqlite://")
@@ -0,0 +1,54 @@
+import json
+import os
+import random
+import subprocess
+import sys
+from collections import Counter
+
+from app import bulk_score
+from app.bulk_score import IocCounts
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_spilled_counts_merge_to_the_in_memory_totals():
+    rng = random.Random(5)
+    expected: Counter = Counter()
+    counts = IocCounts(spill_at=7)
+    for _ in range(50):
+        part = Counter({("links", f"http://x{rng.randrange(40)}.in"): rng.randrange(1, 4) for _ in range(5)})
+        expected.update(part)
+        counts.update(part)
+    assert len(counts._runs) > 1
+
+    items = list(counts.items())
+    counts.close()
+    assert items == [(k, v, n) for (k, v), n in sorted(expected.items())]
+
+
+def test_iocs_out_is_bounded_and_complete(tmp_path, monkeypatch):
+    src = tmp_path / "in.jsonl"
+    src.write_text("".join(
+        json.dumps({"message": f"pay to shop{i % 30}@upi now"}) + "\n" for i in range(90)
+    ))
+    monkeypatch.setattr(bulk_score, "BULK_IOC_SPILL", 4)
+    out = tmp_path / "iocs.jsonl"
+
+    bulk_score.main([str(src), "--iocs-out", str(out), "--workers", "1", "--chunk-size", "10", "--progress", "0"])
+
+    rows = [json.loads(line) for line in out.read_text().splitlines()]
+    upis = {r["value"]: r["count"] for r in rows if r["type"] == "upi_ids"}
+    assert len(upis) == 30
+    assert set(upis.values()) == {3}
+
+
+def test_bulk_score_does_not_load_the_api_or_its_state():
+    script = (
+        "import sys, app.bulk_score; "
+        "print(sorted(m for m in ('app.main', 'app.sessions', 'app.store', 'app.llm_agent', "
+        "'app.persistence', 'app.metrics') if m in sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stdout
+    assert out.strip() == "[]"
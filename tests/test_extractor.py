@@ -0,0 +1,67 @@
+import random
+import re
+from urllib.parse import urlparse
+
+import pytest
+
+from app.extractor import extract_intel
+from benchmarks.corpus import LENGTHS, make_corpus
+
+# the original three-pass extractor, kept as the reference
+UPI_RE = re.compile(r"\b[a-z0-9.\-_]{2,}@[a-z]{2,}\b", re.IGNORECASE)
+PHONE_RE = re.compile(r"\b(?:\+91[\-\s]?)?[6-9]\d{9}\b")
+LINK_RE = re.compile(r"\bhttps?://[^\s<>]+", re.IGNORECASE)
+
+
+def reference_intel(text):
+    links = set(m.group(0) for m in LINK_RE.finditer(text))
+    domains = set()
+    for link in links:
+        try:
+            domains.add(urlparse(link).netloc.lower())
+        except Exception:
+            pass
+    return {
+        "upi_ids": set(m.group(0).lower() for m in UPI_RE.finditer(text)),
+        "phone_numbers": set(m.group(0) for m in PHONE_RE.finditer(text)),
+        "links": links,
+        "domains": domains,
+    }
+
+
+EDGE_CASES = [
+    "support@https://evil.in",
+    "pay@http://x.co/?pa=abc@ybl",
+    "https://pay.in/q+91 9876543210",
+    "see https://a.in/+91 98765 43210 now",
+    "call +91 9876543210@ybl",
+    "+919876543210@paytm",
+    "9876543210@okaxis and 9876543210",
+    "link:https://x.in?pa=9876543210@ybl&pn=Shop",
+    "HTTPS://EVIL.IN/pay Verify@YBL",
+    "mail a.b@gmail.com, upi x_y@upi.",
+    "http://[::1/ broken",
+    "",
+]
+
+
+@pytest.mark.parametrize("text", EDGE_CASES)
+def test_glued_tokens_match_the_three_pass_extractor(text):
+    assert extract_intel(text) == reference_intel(text)
+
+
+@pytest.mark.parametrize("length", LENGTHS)
+def test_corpus_matches_the_three_pass_extractor(length):
+    for text in make_corpus(500, length=length, seed=11):
+        assert extract_intel(text) == reference_intel(text)
+
+
+def test_spliced_corpus_matches_the_three_pass_extractor():
+    # glue random tokens together so entities touch each other
+    rng = random.Random(7)
+    tokens = " ".join(make_corpus(300, length="medium", seed=12)).split() + [
+        "@", "https://", "http://", "+91", "+91-", "9876543210", "@ybl", "?pa=", "/",
+    ]
+    for _ in range(3000):
+        text = "".join(rng.choice(("", "", " ", "\n")) + rng.choice(tokens) for _ in range(rng.randrange(2, 12)))
+        assert extract_intel(text) == reference_intel(text)
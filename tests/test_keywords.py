@@ -0,0 +1,30 @@
+import pytest
+
+from app import keywords
+from app.keywords import CKeywordMatcher, KeywordMatcher, SubstringMatcher
+from benchmarks.corpus import make_corpus
+
+VOCAB = {"upi", "upi pin", "pin", "pay", "payment", "reward", "reward points", "points", "no link"}
+
+MATCHERS = [KeywordMatcher, SubstringMatcher]
+if keywords.ahocorasick is not None:
+    MATCHERS.append(CKeywordMatcher)
+
+
+@pytest.mark.parametrize("matcher", MATCHERS)
+def test_matchers_find_overlapping_keywords(matcher):
+    m = matcher(VOCAB)
+    assert m.find("share your upi pin for reward points") == {
+        "upi", "upi pin", "pin", "reward", "reward points", "points",
+    }
+    assert m.find("repayment") == {"pay", "payment"}
+    assert m.find("nothing here") == frozenset()
+
+
+@pytest.mark.parametrize("matcher", MATCHERS[1:])
+def test_matchers_agree_with_the_automaton(matcher):
+    vocab = keywords._ALL_KEYWORDS
+    reference, other = KeywordMatcher(vocab), matcher(vocab)
+    for text in make_corpus(300, length="medium", seed=3):
+        text = text.lower()
+        assert other.find(text) == reference.find(text)
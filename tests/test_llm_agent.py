@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+
+from app import llm_agent
+from app.llm_agent import CircuitBreaker, generate_honeypot_reply_async
+
+FALLBACK = "fallback reply"
+
+
+def _response(text):
+    return {
+        "id": "resp_1", "object": "response", "created_at": 0, "model": "test", "status": "completed",
+        "output": [{
+            "type": "message", "id": "msg_1", "status": "completed", "role": "assistant",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+        "parallel_tool_calls": False, "tool_choice": "auto", "tools": [],
+    }
+
+
+class FakeProvider:
+    """httpx.MockTransport handler for /v1/responses with switchable delay and failures."""
+
+    def __init__(self):
+        self.delay = 0.0
+        self.fail = False
+        self.requests = 0
+
+    async def __call__(self, request):
+        self.requests += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            return httpx.Response(500, json={"error": {"message": "boom"}})
+        return httpx.Response(200, json=_response("model reply"))
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    fake = FakeProvider()
+
+    def client():
+        return AsyncOpenAI(
+            api_key="test", base_url="http://fake/v1", max_retries=0,
+            http_client=httpx.AsyncClient(transport=httpx.MockTransport(fake)),
+        )
+
+    monkeypatch.setattr(llm_agent, "get_async_client", client)
+    monkeypatch.setattr(llm_agent, "LLM_REPLY_CACHE_SIZE", 0)
+    monkeypatch.setattr(llm_agent, "LLM_TURN_BUDGET_SECONDS", 1.0)
+    monkeypatch.setattr(llm_agent, "_BREAKER", CircuitBreaker(
+        window=10, min_calls=3, failure_rate=0.5, slow_seconds=0.5, cooldown_seconds=0.1,
+    ))
+    monkeypatch.setattr(llm_agent, "_LLM_STATS", dict.fromkeys(llm_agent._LLM_STATS, 0))
+    return fake
+
+
+def _reply():
+    return generate_honeypot_reply_async("confused_customer", [], fallback=FALLBACK)
+
+
+def test_breaker_trips_then_recovers(provider):
+    async def scenario():
+        provider.fail = True
+        for _ in range(3):
+            assert await _reply() == FALLBACK
+        assert llm_agent._BREAKER.state == CircuitBreaker.OPEN
+
+        # open: shed without calling the provider
+        calls = provider.requests
+        assert await _reply() == FALLBACK
+        assert provider.requests == calls
+        assert llm_agent._LLM_STATS["shed_breaker"] == 1
+
+        # after the cooldown one probe goes through and closes the breaker
+        provider.fail = False
+        await asyncio.sleep(0.15)
+        assert await _reply() == "model reply"
+        assert llm_agent._BREAKER.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_turn_budget_caps_a_slow_provider(provider, monkeypatch):
+    monkeypatch.setattr(llm_agent, "LLM_TURN_BUDGET_SECONDS", 0.1)
+    provider.delay = 2.0
+
+    async def scenario():
+        start = time.monotonic()
+        assert await _reply() == FALLBACK
+        return time.monotonic() - start
+
+    assert asyncio.run(scenario()) < 1.0
+    assert llm_agent._LLM_STATS["errors"] == 1
+
+
+def test_calls_beyond_max_in_flight_are_shed(provider, monkeypatch):
+    monkeypatch.setattr(llm_agent, "LLM_MAX_IN_FLIGHT", 2)
+    provider.delay = 0.2
+
+    async def scenario():
+        return await asyncio.gather(*[_reply() for _ in range(5)])
+
+    replies = asyncio.run(scenario())
+    assert replies.count("model reply") == 2
+    assert replies.count(FALLBACK) == 3
+    assert llm_agent._LLM_STATS["shed_concurrency"] == 3
+    assert provider.requests == 2
+
+
+def test_cancelled_half_open_probe_does_not_wedge_the_breaker(provider):
+    async def scenario():
+        provider.fail = True
+        for _ in range(3):
+            await _reply()
+        assert llm_agent._BREAKER.state == CircuitBreaker.OPEN
+        await asyncio.sleep(0.15)
+
+        # the single half-open probe is cancelled mid-call
+        provider.fail = False
+        provider.delay = 5.0
+        probe = asyncio.create_task(_reply())
+        await asyncio.sleep(0.05)
+        assert llm_agent._BREAKER.state == CircuitBreaker.HALF_OPEN
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        assert llm_agent._BREAKER.state == CircuitBreaker.OPEN
+
+        # the next cooldown allows a fresh probe, which recovers
+        provider.delay = 0.0
+        await asyncio.sleep(0.15)
+        assert await _reply() == "model reply"
+        assert llm_agent._BREAKER.state == CircuitBreaker.CLOSED
+
+    asyncio.run(scenario())
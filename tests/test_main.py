@@ -0,0 +1,112 @@
+import asyncio
+import json
+import threading
+
+import httpx
+
+from app import main
+from app.scoring import analyze_message
+
+
+def _post(path, **kwargs):
+    async def go():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.post(path, **kwargs)
+    return asyncio.run(go())
+
+
+def _ndjson(r):
+    assert r.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in r.text.splitlines()]
+
+
+MSGS = ["Pay 99 now to rewardsverify@upi", "Your order was delivered", "urgent: share UPI PIN"]
+RULE_FIELDS = ("is_scam", "scam_score", "scam_type", "reasons")
+
+
+def test_honeypot_start_creates_the_session_off_the_event_loop(monkeypatch):
+    threads = []
+    create = main.create_session
+
+    def recording_create(*args, **kwargs):
+        threads.append(threading.current_thread())
+        return create(*args, **kwargs)
+
+    monkeypatch.setattr(main, "create_session", recording_create)
+    r = _post("/honeypot/start", json={"message": "pay 99 to reward@ybl now"})
+
+    assert r.status_code == 200
+    assert r.json()["session"]["id"] == r.json()["session_id"]
+    assert threads and threads[0] is not threading.main_thread()
+
+
+def test_batch_json_array_with_invalid_items(monkeypatch):
+    monkeypatch.setattr(main, "BATCH_CHUNK_SIZE", 2)
+    body = [MSGS[0], {"message": MSGS[1]}, 42, {"text": "no message key"}, MSGS[2]]
+    out = _ndjson(_post("/analyze/batch", json=body))
+
+    assert [o["index"] for o in out] == [0, 1, 2, 3, 4]
+    assert out[2] == {"index": 2, "error": "invalid_item"}
+    assert out[3] == {"index": 3, "error": "invalid_item"}
+    for o, m in zip([out[0], out[1], out[4]], MSGS):
+        expected = analyze_message(m)
+        assert {k: o[k] for k in RULE_FIELDS} == {k: expected[k] for k in RULE_FIELDS}
+        assert "seen_count" in o
+
+
+def test_batch_ndjson_with_invalid_lines(monkeypatch):
+    monkeypatch.setattr(main, "BATCH_CHUNK_SIZE", 2)
+    lines = [json.dumps({"message": MSGS[0]}), "{not json", "", json.dumps(MSGS[1]), json.dumps(MSGS[2])]
+    r = _post("/analyze/batch", content="\n".join(lines).encode(),
+              headers={"content-type": "application/x-ndjson"})
+    out = _ndjson(r)
+
+    assert [o["index"] for o in out] == [0, 1, 2, 3]
+    assert out[1] == {"index": 1, "error": "invalid_item"}
+    assert [o["scam_type"] for o in (out[0], out[2], out[3])] == [
+        analyze_message(m)["scam_type"] for m in MSGS
+    ]
+
+
+def test_batch_json_that_is_not_an_array():
+    out = _ndjson(_post("/analyze/batch", json={"message": "hi"}))
+    assert out == [{"index": 0, "error": "invalid_item"}]
+
+
+def test_batch_stops_when_the_client_disconnects(monkeypatch):
+    monkeypatch.setattr(main, "BATCH_CHUNK_SIZE", 1)
+    body = json.dumps(["pay now"] * 50).encode()
+    sent = []
+    received = []
+
+    async def receive():
+        if not received:
+            received.append(1)
+            return {"type": "http.request", "body": body, "more_body": False}
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": "/analyze/batch", "raw_path": b"/analyze/batch",
+        "query_string": b"", "root_path": "", "server": ("test", 80), "client": ("test", 1),
+        "headers": [(b"content-type", b"application/json")],
+    }
+    asyncio.run(main.app(scope, receive, send))  # returns without raising
+
+    bodies = [m for m in sent if m["type"] == "http.response.body" and m.get("body")]
+    assert len(bodies) < 50
+
+
+def test_analyze_reports_a_template_match_for_a_variant():
+    template = "Dear {0}, your KYC expires today. Pay Rs {1} processing fee to {0}kyc@ybl to avoid account block"
+    _post("/analyze", json={"message": template.format("ravi", 49)})
+    second = _post("/analyze", json={"message": template.format("meena", 99)}).json()
+
+    assert second["memory_match"] is False
+    assert second["template_match"] is True
+    assert second["similarity"] >= main.NEAR_DUP_THRESHOLD
+    assert second["template_seen_count"] == 1
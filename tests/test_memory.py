@@ -0,0 +1,81 @@
+import os
+import random
+import subprocess
+import sys
+
+import pytest
+
+from app import memory
+from app.memory import IocColumns, TopK, get_top_iocs, store_iocs
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_SCRIPT = """
+from app import memory
+for day in range(10):
+    memory._day_hlls(f"2026-01-{day + 1:02d}")
+print(memory.IOC_APPROX_DAYS, sorted(memory._HLL_BY_DAY))
+"""
+
+
+def test_zero_approx_days_still_prunes_old_days():
+    env = {**os.environ, "IOC_APPROX": "1", "IOC_APPROX_DAYS": "0"}
+    out = subprocess.run(
+        [sys.executable, "-c", _SCRIPT], cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    assert out.strip() == "1 ['2026-01-10']"
+
+
+@pytest.fixture
+def fresh_iocs(monkeypatch):
+    monkeypatch.setattr(memory, "IOC_MEMORY", {t: IocColumns() for t in memory.IOC_MEMORY})
+    monkeypatch.setattr(memory, "_TOP", TopK(memory.IOC_TOP_K))
+    monkeypatch.setattr(memory, "_TOP_BY_TYPE", {t: TopK(memory.IOC_TOP_K) for t in memory.IOC_MEMORY})
+
+
+def _brute_top(limit, ioc_type=None):
+    rows = [
+        (count, t, v)
+        for t, columns in memory.IOC_MEMORY.items() if ioc_type in (None, t)
+        for v, count in columns.items()
+    ]
+    return sorted((c for c, _, _ in rows), reverse=True)[:limit]
+
+
+def test_top_k_matches_a_full_sort():
+    rng = random.Random(3)
+    top = TopK(10)
+    counts = {}
+    for _ in range(5000):
+        key = ("upi_ids", f"v{int(rng.paretovariate(1.2)) % 300}")
+        counts[key] = counts.get(key, 0) + 1
+        top.update(key, counts[key])
+
+    got = top.top(10)
+    assert [c for _, c in got] == sorted(counts.values(), reverse=True)[:10]
+    assert all(counts[k] == c for k, c in got)
+    assert top.top(3) == got[:3]
+
+
+def test_get_top_iocs_overall_and_per_type(fresh_iocs):
+    rng = random.Random(4)
+    for _ in range(3000):
+        store_iocs({
+            "upi_ids": [f"u{int(rng.paretovariate(1.1)) % 200}@ybl"],
+            "domains": [f"d{int(rng.paretovariate(1.5)) % 80}.in"],
+            "phone_numbers": [f"9{rng.randrange(10 ** 9):09d}"],
+        })
+
+    overall = get_top_iocs(10)
+    assert [r["count"] for r in overall] == _brute_top(10)
+    for t in ("upi_ids", "domains"):
+        rows = get_top_iocs(5, ioc_type=t)
+        assert [r["count"] for r in rows] == _brute_top(5, t)
+        assert {r["type"] for r in rows} == {t[:-1]}
+    for r in overall:
+        assert memory.IOC_MEMORY[r["type"] + "s"][r["value"]] == r["count"]
+
+    # above IOC_TOP_K: the full sort fallback
+    big = get_top_iocs(memory.IOC_TOP_K + 50)
+    assert [r["count"] for r in big] == _brute_top(memory.IOC_TOP_K + 50)
+    assert get_top_iocs(5, ioc_type="nope") == []
@@ -0,0 +1,45 @@
+from app import near_dup
+from app.near_dup import NEAR_DUP_THRESHOLD, MinHashIndex, minhash
+
+TEMPLATE = "Dear {name}, your reward points worth Rs {amount} expire today. Redeem now by paying to {upi} and share the OTP"
+
+
+def _variant(i):
+    return TEMPLATE.format(name=f"user{i}", amount=100 + 37 * i, upi=f"redeem{i}@ybl")
+
+
+def test_template_variants_find_the_first_copy():
+    index = MinHashIndex(max_entries=100)
+    index.add("first", _variant(0))
+    index.add("other", "Your Amazon order has been delivered. Rate your experience in the app")
+
+    key, sim = index.nearest("new", _variant(7))
+    assert key == "first"
+    assert sim >= NEAR_DUP_THRESHOLD
+
+    assert index.nearest("first", _variant(0)) == ("first", 1.0)
+    found = index.nearest("x", "Reminder: assignment submission deadline is Friday at noon")
+    assert found is None or found[1] < NEAR_DUP_THRESHOLD
+
+
+def test_index_is_bounded_and_forgets_evicted_keys():
+    index = MinHashIndex(max_entries=5)
+    for i in range(20):
+        index.add(f"k{i}", _variant(i))
+    assert len(index) == 5
+    assert list(index._sigs) == [f"k{i}" for i in range(15, 20)]
+
+    referenced = set()
+    for cur in index._buckets.values():
+        referenced.update([cur] if isinstance(cur, str) else cur)
+    assert referenced <= set(index._sigs)
+
+    index.remove("k19")
+    assert index.nearest("q", _variant(19))[0] != "k19"
+
+
+def test_signatures_match_without_numpy(monkeypatch):
+    texts = [_variant(i) for i in range(5)] + ["", "one", "pay 99 now"]
+    with_np = [minhash.__wrapped__(t) for t in texts]
+    monkeypatch.setattr(near_dup, "np", None)
+    assert [minhash.__wrapped__(t) for t in texts] == with_np
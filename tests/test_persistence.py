@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+from app import persistence
+from app.persistence import Persistence
+from app.sessions import memory_lookup, memory_update
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def _namespace(p, data, failures):
+    def get(key):
+        if failures:
+            failures.pop()
+            raise RuntimeError("dictionary changed size during iteration")
+        return data.get(key)
+
+    def apply(key, value):
+        if value is None:
+            data.pop(key, None)
+        else:
+            data[key] = value
+
+    return p.register("kv", get, apply, lambda: list(data))
+
+
+def test_writer_survives_errors_and_retries(tmp_path, monkeypatch):
+    monkeypatch.setattr(persistence, "PERSIST_FLUSH_SECONDS", 0.02)
+    data = {"a": 1}
+    failures = [1, 1]  # the first two encodes raise
+    p = Persistence(str(tmp_path))
+    mark = _namespace(p, data, failures)
+    p.load()
+    p.start()
+    try:
+        mark("a")
+        _wait_for(lambda: p.stats["logged_records"] >= 1)
+        assert p.stats["errors"] >= 1
+        assert "RuntimeError" in p.stats["last_error"]
+        assert p._thread.is_alive()
+    finally:
+        p.stop()
+
+    restored = {}
+    q = Persistence(str(tmp_path))
+    _namespace(q, restored, [])
+    q.load()
+    assert restored == {"a": 1}
+
+
+def test_memory_keeps_its_own_copy_of_the_analyze_result():
+    text = f"pay now {uuid.uuid4()}"
+    result = {"scam_score": 0.9, "reasons": ["keyword:pay"]}
+    memory_update(text, analyze_result=result)
+    result["seen_count"] = 1  # what main._with_memory does afterwards
+    assert "seen_count" not in memory_lookup(text)["last_analyze"]
+
+
+def test_directory_is_locked_against_a_second_process(tmp_path):
+    first = Persistence(str(tmp_path))
+    first.load()
+    try:
+        code = (
+            "import sys; from app.persistence import Persistence\n"
+            "try:\n    Persistence(sys.argv[1]).load()\n"
+            "except RuntimeError as e:\n    print(e)\n"
+        )
+        out = subprocess.run([sys.executable, "-c", code, str(tmp_path)], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+        assert "in use by another process" in out.stdout
+    finally:
+        first.stop()
+
+    # released on stop
+    second = Persistence(str(tmp_path))
+    second.load()
+    second.stop()
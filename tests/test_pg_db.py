@@ -0,0 +1,127 @@
+import json
+import logging
+import queue
+import threading
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app import pg_db
+
+_SCHEMA = """
+    CREATE TABLE scam_messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        message TEXT, scam_type TEXT, confidence REAL, source TEXT,
+        detected_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'scam.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(_SCHEMA))
+    monkeypatch.setattr(pg_db, "engine", engine)
+    monkeypatch.setattr(pg_db, "SessionLocal", sessionmaker(bind=engine, autoflush=False, autocommit=False))
+    monkeypatch.setattr(pg_db, "_rollups_ready", False)
+    monkeypatch.setattr(pg_db, "_STATS_CACHE", {})
+    monkeypatch.setattr(pg_db, "_WRITE_QUEUE", queue.Queue(maxsize=1000))
+    monkeypatch.setattr(pg_db, "_WRITE_STATS", dict.fromkeys(pg_db._WRITE_STATS, 0))
+    monkeypatch.setattr(pg_db, "PG_WRITE_BEHIND", True)
+    monkeypatch.setattr(pg_db, "PG_WRITE_FLUSH_SECONDS", 1.0)
+    yield engine
+    pg_db.stop_writer()
+
+
+def _count(engine):
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM scam_messages")).scalar()
+
+
+def test_rows_are_written_in_batches(db, monkeypatch):
+    monkeypatch.setattr(pg_db, "PG_WRITE_BATCH_SIZE", 10)
+    for i in range(25):
+        pg_db.insert_scam_message(f"msg {i}", "UPI_PAYMENT", 0.9, source="test")
+    pg_db.flush_pending_writes()
+
+    assert _count(db) == 25
+    stats = pg_db.write_stats()
+    assert (stats["enqueued"], stats["written"], stats["batches"], stats["pending"]) == (25, 25, 3, 0)
+    assert pg_db.fetch_stats()["total"] == 25
+
+
+def test_full_queue_applies_backpressure(db, monkeypatch):
+    monkeypatch.setattr(pg_db, "_WRITE_QUEUE", queue.Queue(maxsize=2))
+    monkeypatch.setattr(pg_db, "PG_WRITE_ENQUEUE_TIMEOUT", 0.05)
+    monkeypatch.setattr(pg_db, "PG_WRITE_FLUSH_SECONDS", 0.01)
+    writing, release = threading.Event(), threading.Event()
+    real_insert = pg_db.insert_scam_messages
+
+    def slow_insert(rows):
+        writing.set()
+        release.wait(5)
+        real_insert(rows)
+
+    monkeypatch.setattr(pg_db, "insert_scam_messages", slow_insert)
+
+    pg_db.insert_scam_message("first", "UPI_PAYMENT", 0.9)  # taken by the writer, which then blocks
+    assert writing.wait(5)
+    pg_db.insert_scam_message("second", "UPI_PAYMENT", 0.9)
+    pg_db.insert_scam_message("third", "UPI_PAYMENT", 0.9)
+    with pytest.raises(queue.Full):
+        pg_db.insert_scam_message("fourth", "UPI_PAYMENT", 0.9)
+
+    release.set()
+    pg_db.flush_pending_writes()
+    assert _count(db) == 3
+
+
+def test_stop_writer_flushes_the_queue(db):
+    for i in range(7):
+        pg_db.insert_scam_message(f"msg {i}", "JOB_SCAM", 0.7)
+    pg_db.stop_writer()
+
+    assert _count(db) == 7
+    assert pg_db._writer is None
+
+
+def test_dropped_batch_is_logged_and_dead_lettered(db, monkeypatch, tmp_path, caplog):
+    dead = tmp_path / "dead.jsonl"
+    monkeypatch.setattr(pg_db, "PG_DEAD_LETTER_PATH", str(dead))
+    monkeypatch.setattr(pg_db, "PG_WRITE_FLUSH_SECONDS", 0.01)
+
+    def failing_insert(rows):
+        raise RuntimeError("database is down")
+
+    monkeypatch.setattr(pg_db, "insert_scam_messages", failing_insert)
+    with caplog.at_level(logging.WARNING, logger="app.pg_db"):
+        for i in range(3):
+            pg_db.insert_scam_message(f"msg {i}", "PHISHING", 0.8)
+        pg_db.flush_pending_writes()
+
+    assert pg_db.write_stats()["failed"] == 3
+    assert pg_db.write_stats()["dead_lettered"] == 3
+    assert [json.loads(line)["m"] for line in dead.read_text().splitlines()] == ["msg 0", "msg 1", "msg 2"]
+    assert any("3 rows failed twice" in r.getMessage() for r in caplog.records)
+
+
+def test_rollups_match_a_rebuild_and_backfill_once(db):
+    with db.begin() as conn:
+        conn.execute(text("INSERT INTO scam_messages (message, scam_type, source) VALUES ('old', 'JOB_SCAM', 'user')"))
+
+    pg_db.insert_scam_messages([
+        {"m": "a", "t": "UPI_PAYMENT", "c": 0.9, "s": "user"},
+        {"m": "b", "t": "UPI_PAYMENT", "c": 0.8, "s": "bulk"},
+        {"m": "c", "t": None, "c": 0.1, "s": None},
+    ])
+    pg_db.ensure_rollups()  # already done: must not backfill again
+    live = pg_db.fetch_stats()
+
+    pg_db.rebuild_rollups()
+    rebuilt = pg_db.fetch_stats()
+
+    assert live == rebuilt
+    assert live["total"] == 4
+    assert [r["count"] for r in live["timeseries"]] == [4]
@@ -0,0 +1,19 @@
+import pytest
+
+from app import scoring
+from app.scoring import analyze_batch, analyze_message
+from benchmarks.corpus import LENGTHS, make_corpus
+
+
+@pytest.mark.parametrize("length", LENGTHS)
+def test_batch_matches_per_message_scoring(length):
+    msgs = make_corpus(400, length=length, seed=21) + ["", "hello", "PAY NOW upi pin"]
+    assert analyze_batch(msgs) == [analyze_message(m) for m in msgs]
+
+
+def test_batch_without_numpy_matches(monkeypatch):
+    msgs = make_corpus(100, length="medium", seed=22)
+    expected = analyze_batch(msgs)
+    monkeypatch.setattr(scoring, "np", None)
+    assert analyze_batch(msgs) == expected
+    assert analyze_batch([]) == []
@@ -0,0 +1,189 @@
+import threading
+import time
+import uuid
+
+import app.honeypot as hp
+from app import sessions
+from app.sessions import create_session, get_session, reap_sessions
+
+
+def _endless_sessions(monkeypatch):
+    monkeypatch.setattr(hp, "MAX_TURNS", 10 ** 9)
+    monkeypatch.setattr(hp, "NO_PROGRESS_LIMIT", 10 ** 9)
+    monkeypatch.setattr(hp, "REPEAT_LIMIT", 10 ** 9)
+    monkeypatch.setattr(hp, "_all_intel_collected", lambda s: False)
+
+
+def test_unknown_session_ids_create_no_locks():
+    before = len(sessions._SESSION_LOCKS)
+    for _ in range(1000):
+        out = hp.handle_incoming_scammer_message(str(uuid.uuid4()), "pay now")
+        assert out == {"error": "session_not_found"}
+    assert len(sessions._SESSION_LOCKS) == before
+
+
+def test_concurrent_turns_on_one_session_are_serialized(monkeypatch):
+    _endless_sessions(monkeypatch)
+    sid = str(uuid.uuid4())
+    create_session(sid)
+
+    def scammer(t):
+        for i in range(25):
+            hp.handle_incoming_scammer_message(sid, f"send to t{t}n{i}@ybl")
+
+    threads = [threading.Thread(target=scammer, args=(t,)) for t in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    s = get_session(sid)
+    assert s.turns == 200
+    assert len(s.upi_ids) == 200
+    assert len(s.messages) == 400
+
+
+def test_reaper_drops_session_and_its_lock(monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_IDLE_TTL_SECONDS", 10)
+    sid = str(uuid.uuid4())
+    s = create_session(sid)
+    assert sid in sessions._SESSION_LOCKS
+
+    assert reap_sessions(now=s.last_scammer_time + 3600) >= 1
+    assert get_session(sid) is None
+    assert sid not in sessions._SESSION_LOCKS
+    assert hp.handle_incoming_scammer_message(sid, "hello") == {"error": "session_not_found"}
+
+
+def test_expiry_keeps_a_record_touched_after_the_scan(monkeypatch):
+    monkeypatch.setattr(sessions, "MEMORY_TTL_SECONDS", 60)
+    text = f"pay to {uuid.uuid4().hex[:10]}@ybl"
+    upi = text.split()[-1]
+    h = sessions.message_hash(text)
+    rec = sessions.memory_update(text, intel={"upi_ids": [upi]})
+    stale = {**rec, "last_seen": rec["last_seen"] - 3600}
+
+    # the scan saw an old copy; the record itself was touched before the delete
+    monkeypatch.setattr(sessions._MEMORY, "items", lambda older_than=None: [(h, stale)])
+    sessions._memory_expire(rec["last_seen"] + 30)
+
+    assert sessions._MEMORY.get(h) is not None
+    assert h in sessions.ioc_lookup("upi_ids", upi)["messages"]
+
+    sessions._memory_expire(rec["last_seen"] + 120)
+    assert sessions._MEMORY.get(h) is None
+    assert h not in sessions.ioc_lookup("upi_ids", upi)["messages"]
+
+
+def test_reaped_session_keeps_its_intel_in_the_archive(monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_ENDED_TTL_SECONDS", 10)
+    sid = str(uuid.uuid4())
+    create_session(sid, analyze_result={"scam_type": "UPI_PAYMENT"})
+    hp.handle_incoming_scammer_message(sid, "pay to arch1@ybl or call 9876543210")
+    sessions.end_session(sid, "all_intel_collected")
+    live = sessions.serialize_session(sid)
+
+    assert reap_sessions(now=get_session(sid).last_scammer_time + 60) >= 1
+    assert get_session(sid) is None
+
+    view = sessions.serialize_session(sid)
+    assert view["archived"] is True
+    assert view["status"] == "ENDED"
+    assert view["stop_reason"] == "all_intel_collected"
+    assert view["intel"] == live["intel"]
+    assert view["analyze_result"] == {"scam_type": "UPI_PAYMENT"}
+    assert view["messages"] == []
+    assert sessions.serialize_session(sid, summary=True)["intel_counts"]["upi_ids"] == 1
+    assert sessions.serialize_session(sid, since=view["cursor"])["intel_new"]["upi_ids"] == []
+
+
+def test_session_archive_is_bounded(monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_ARCHIVE_MAX_ENTRIES", 3)
+    monkeypatch.setattr(sessions, "SESSION_ENDED_TTL_SECONDS", 10)
+    ids = [str(uuid.uuid4()) for _ in range(5)]
+    for sid in ids:
+        create_session(sid)
+        sessions.end_session(sid, "max_turns")
+    reap_sessions(now=time.time() + 60)
+
+    assert len(sessions._SESSION_ARCHIVE) == 3
+    assert sessions.serialize_session(ids[0]) is None
+    assert sessions.serialize_session(ids[-1])["archived"] is True
+
+
+def test_ioc_lookup_finds_a_reaped_session(monkeypatch):
+    monkeypatch.setattr(sessions, "SESSION_ENDED_TTL_SECONDS", 10)
+    monkeypatch.setattr(sessions, "SESSION_ARCHIVE_MAX_ENTRIES", 1000)
+    upi = f"{uuid.uuid4().hex[:10]}@ybl"
+    sid = str(uuid.uuid4())
+    create_session(sid)
+    hp.handle_incoming_scammer_message(sid, f"pay to {upi}")
+    sessions.end_session(sid, "max_turns")
+
+    reap_sessions(now=time.time() + 60)
+    assert get_session(sid) is None
+    assert sid in sessions.ioc_lookup("upi_ids", upi)["sessions"]
+    assert sessions.serialize_session(sid)["archived"] is True
+
+    # postings go with the archive record, on the archive's own TTL
+    monkeypatch.setattr(sessions, "SESSION_ARCHIVE_TTL_SECONDS", 3600)
+    reap_sessions(now=time.time() + 7200)
+    assert sessions.serialize_session(sid) is None
+    assert sid not in sessions.ioc_lookup("upi_ids", upi)["sessions"]
+
+
+def test_since_cursor_returns_exactly_the_new_turns_and_intel(monkeypatch):
+    _endless_sessions(monkeypatch)
+    sid = str(uuid.uuid4())
+    create_session(sid)
+
+    hp.handle_incoming_scammer_message(sid, "pay to first1@ybl")
+    first = sessions.serialize_session(sid)
+    assert first["cursor"] == 2
+    assert first["intel"]["upi_ids"] == ["first1@ybl"]
+
+    # up to date: nothing new
+    same = sessions.serialize_session(sid, since=first["cursor"])
+    assert same["messages"] == []
+    assert all(v == [] for v in same["intel_new"].values())
+    assert same["cursor"] == first["cursor"]
+
+    hp.handle_incoming_scammer_message(sid, "no details here")
+    hp.handle_incoming_scammer_message(sid, "call 9876543210 or pay second2@ybl, https://x.in/p")
+    delta = sessions.serialize_session(sid, since=first["cursor"])
+    assert delta["cursor"] == 6
+    assert [(m["role"], m["text"]) for m in delta["messages"]] == [
+        (role, text) for role, text, _ in get_session(sid).messages[2:]
+    ]
+    assert delta["intel_new"] == {
+        "upi_ids": ["second2@ybl"],
+        "phone_numbers": ["9876543210"],
+        "links": ["https://x.in/p"],
+        "domains": ["x.in"],
+    }
+
+    # a cursor between the two turns only returns the later one
+    mid = sessions.serialize_session(sid, since=4)
+    assert [m["text"] for m in mid["messages"]][0].startswith("call 9876543210")
+    assert mid["intel_new"]["upi_ids"] == ["second2@ybl"]
+    assert sessions.serialize_session(sid, since=5)["intel_new"]["upi_ids"] == []
+
+    # since=0 (and negative) covers everything
+    full = sessions.serialize_session(sid, since=-3)
+    assert full["since"] == 0
+    assert sorted(full["intel_new"]["upi_ids"]) == ["first1@ybl", "second2@ybl"]
+    assert len(full["messages"]) == 6
+
+
+def test_summary_omits_the_transcript(monkeypatch):
+    _endless_sessions(monkeypatch)
+    sid = str(uuid.uuid4())
+    create_session(sid)
+    hp.handle_incoming_scammer_message(sid, "pay to sum1@ybl or sum2@ybl")
+
+    out = sessions.serialize_session(sid, summary=True)
+    assert out["cursor"] == 2
+    assert out["intel_counts"] == {"upi_ids": 2, "phone_numbers": 0, "links": 0, "domains": 0}
+    for key in ("messages", "intel", "intel_new", "analyze_result"):
+        assert key not in out
+    assert "messages" not in sessions.serialize_session(sid, since=0, summary=True)
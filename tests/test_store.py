@@ -0,0 +1,67 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MEMORY_WORKER = """
+import os
+from app.sessions import memory_update
+for i in range({n}):
+    memory_update("pay now to fraud@ybl", intel={{"upi_ids": {{"u%dx%d@ybl" % (os.getpid(), i)}}}})
+"""
+
+TURN_WORKER = """
+import os
+import app.honeypot as hp
+hp.MAX_TURNS = hp.NO_PROGRESS_LIMIT = hp.REPEAT_LIMIT = 10 ** 9
+hp._all_intel_collected = lambda s: False
+for i in range({n}):
+    out = hp.handle_incoming_scammer_message("s1", "send to p%dn%d@ybl" % (os.getpid(), i))
+    assert "error" not in out, out
+"""
+
+
+def _sqlite_env(path):
+    return {**os.environ, "STATE_BACKEND": "sqlite", "STATE_SQLITE_PATH": str(path), "PYTHONPATH": ROOT}
+
+
+def _run_parallel(code, procs, env):
+    running = [
+        subprocess.Popen([sys.executable, "-c", textwrap.dedent(code)], env=env, cwd=ROOT)
+        for _ in range(procs)
+    ]
+    assert [p.wait(timeout=120) for p in running] == [0] * procs
+
+
+def _query(code, env):
+    out = subprocess.run([sys.executable, "-c", textwrap.dedent(code)], env=env, cwd=ROOT,
+                         capture_output=True, text=True, check=True)
+    return out.stdout.split()
+
+
+def test_sqlite_memory_update_is_atomic_across_processes(tmp_path):
+    env = _sqlite_env(tmp_path / "state.db")
+    _run_parallel(MEMORY_WORKER.format(n=100), 4, env)
+    count, upis, indexed = _query("""
+        from app.sessions import memory_lookup, memory_stats
+        rec = memory_lookup("pay now to fraud@ybl")
+        print(rec["count"], len(rec["intel"]["upi_ids"]), memory_stats()["ioc_index_entries"])
+    """, env)
+    assert (int(count), int(upis), int(indexed)) == (400, 400, 400)
+
+
+def test_sqlite_session_turns_are_atomic_across_processes(tmp_path):
+    env = _sqlite_env(tmp_path / "state.db")
+    _query("""
+        from app.sessions import create_session
+        create_session("s1")
+    """, env)
+    _run_parallel(TURN_WORKER.format(n=60), 2, env)
+    turns, upis, messages = _query("""
+        from app.sessions import get_session
+        s = get_session("s1")
+        print(s.turns, len(s.upi_ids), len(s.messages))
+    """, env)
+    assert (int(turns), int(upis), int(messages)) == (120, 120, 240)